@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Optional
+
+from .config import settings
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_blocking: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Event loop used by the asyncio worker runtime, started on first use in its own thread."""
+    global _loop, _thread, _blocking
+    with _lock:
+        if _loop is None:
+            _blocking = ThreadPoolExecutor(
+                max_workers=max(1, settings.async_blocking_threads),
+                thread_name_prefix="async-blocking",
+            )
+            _loop = asyncio.new_event_loop()
+            _loop.set_default_executor(_blocking)
+            _thread = threading.Thread(target=_loop.run_forever, name="async-runtime", daemon=True)
+            _thread.start()
+        return _loop
+
+
+def submit(coro: Coroutine[Any, Any, Any]):
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+async def run_blocking(fn: Callable[..., Any], *args) -> Any:
+    """Run DB/disk work on the small blocking pool so the loop only waits on sockets."""
+    return await asyncio.get_running_loop().run_in_executor(_blocking, fn, *args)
+
+
+def call_soon(fn: Callable[..., Any], *args) -> None:
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(fn, *args)
+
+
+def shutdown_runtime() -> None:
+    global _loop, _thread, _blocking
+    with _lock:
+        loop, thread, blocking = _loop, _thread, _blocking
+        _loop = _thread = _blocking = None
+    if loop is None:
+        return
+    from .llm_gateway import aclose_clients
+
+    try:
+        asyncio.run_coroutine_threadsafe(aclose_clients(), loop).result(timeout=5)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None:
+        thread.join(timeout=5)
+    blocking.shutdown(wait=False)
@@ -12,13 +12,39 @@ class Settings(BaseSettings):
 
     # DB
     database_url: str = "sqlite:///./data/mangat.db"
+    sqlite_wal: bool = True
+    sqlite_busy_timeout_ms: int = 30000
+    # Window in which page status / progress writes from all workers share one transaction
+    write_coalesce_ms: int = 50
 
     # Queue
     queue_stage_a: str = "stage-a"
     queue_stage_b: str = "stage-b"
     queue_qa: str = "qa"
+    queue_import: str = "import"
     stage_a_concurrency: int = 6
     stage_b_concurrency: int = 4
+    preview_pages: int = 2
+    # waves: Stage A runs a job in segments so each page starts after its previous page;
+    # opportunistic: neighbour context is used only if it happens to exist
+    stage_a_context_mode: str = "waves"
+    # Consecutive pages sent in one Stage A request (1 = one page per request)
+    stage_a_batch_size: int = 1
+    max_pool_workers: int = 64
+    task_lease_seconds: int = 60
+    task_max_attempts: int = 3
+    # Finished (done/failed) task rows are deleted after this long; 0 keeps them forever
+    task_retention_hours: float = 24.0
+    # inline: the API process runs the Stage A/B workers; external: run `python -m app.worker`
+    worker_mode: str = "inline"
+    worker_poll_seconds: float = 2.0
+    # Progress events kept per job for clients resuming with Last-Event-ID
+    event_buffer_size: int = 2000
+    event_keepalive_seconds: float = 15.0
+    # threads: one OS thread per in-flight task; asyncio: tasks are coroutines on one event loop
+    # and max_pool_workers can be raised to keep hundreds of model calls in flight
+    worker_runtime: str = "threads"
+    async_blocking_threads: int = 8
 
     # Model Gateway (OpenAI-compatible)
     openai_base_url: str = "https://api.openai.com"
@@ -40,9 +66,65 @@ class Settings(BaseSettings):
     stage_a_timeout: int = 120
     stage_b_timeout: int = 300
     retries: int = 1
+    # Re-render only the regions whose items changed since the last Stage B output. Opt-in:
+    # region renders depend on the previous output, so they bypass the render cache
+    stage_b_incremental: bool = False
+    # Padding around changed items (px of the original) and the changed-area share above
+    # which the whole page is rendered again
+    stage_b_region_padding: int = 32
+    stage_b_incremental_max_area: float = 0.5
+    # off | auto | always. auto renders pages whose long edge exceeds stage_b_tile_max_edge as
+    # tiles around item clusters, stitched back at the original resolution. Opt-in per job:
+    # tiles give the model less page context, so whole-page renders stay the default
+    stage_b_tiling: str = "off"
+    stage_b_tile_max_edge: int = 2048
+    # Model B calls one page may have in flight at once (regions / tiles)
+    stage_b_region_parallelism: int = 4
+
+    # Stage A upload preprocessing
+    # (max_edge 0 keeps full size; format: jpeg | webp | png | original)
+    stage_a_max_edge: int = 2048
+    stage_a_image_format: str = "jpeg"
+    stage_a_image_quality: int = 90
+
+    # HTTP client pool (shared per upstream origin)
+    http_max_connections: int = 32
+    http_max_keepalive: int = 16
+    http_keepalive_expiry: float = 60.0
+    http2: bool = False
+    async_max_connections: int = 256
+
+    # Upstream rate adaptation (per endpoint, AIMD). The cap only bounds the adaptive limit;
+    # throttling responses shrink it, so it can sit well above what the provider allows
+    upstream_min_concurrency: int = 1
+    upstream_max_concurrency: int = 256
+    backoff_base: float = 1.0
+    backoff_max: float = 60.0
 
     # Files
     keep_all_artifacts: bool = True
+    import_batch_size: int = 50
+
+    # PDF rasterization (pdf_workers 0 = one per CPU)
+    pdf_dpi: int = 200
+    pdf_format: str = "png"  # png | jpeg
+    pdf_workers: int = 0
+    pdf_pages_per_task: int = 8
+
+    # Page viewer derivatives (?size=thumb|preview): long edge in px, webp | jpeg,
+    # derivative_workers 0 = one per CPU
+    thumb_edge: int = 320
+    preview_edge: int = 1600
+    derivative_format: str = "webp"
+    derivative_quality: int = 80
+    derivative_workers: int = 0
+
+    # Caches (MB, 0 disables)
+    stage_a_cache_mb: int = 256
+    stage_b_cache_mb: int = 2048
+    derivative_cache_mb: int = 512
+    # Seconds a worker trusts its cached global settings before re-reading them
+    config_cache_ttl: float = 5.0
 
     class Config:
         env_file = ".env"
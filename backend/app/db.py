@@ -1,5 +1,5 @@
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from .config import settings
 
@@ -20,19 +20,70 @@ def _ensure_sqlite_path(url: str) -> None:
     db_path.parent.mkdir(parents=True, exist_ok=True)
 
 
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    cur = dbapi_conn.cursor()
+    try:
+        # WAL lets readers run alongside the single writer; NORMAL sync is safe with WAL
+        if settings.sqlite_wal:
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    finally:
+        cur.close()
+
+
 def _make_engine():
     url = settings.database_url
     connect_args = {}
     if url.startswith("sqlite"):
         _ensure_sqlite_path(url)
-        connect_args = {"check_same_thread": False}
-    return create_engine(url, pool_pre_ping=True, connect_args=connect_args)
+        connect_args = {
+            "check_same_thread": False,
+            "timeout": settings.sqlite_busy_timeout_ms / 1000,
+        }
+    engine = create_engine(url, pool_pre_ping=True, connect_args=connect_args)
+    if url.startswith("sqlite"):
+        event.listen(engine, "connect", _sqlite_pragmas)
+    return engine
 
 
 engine = _make_engine()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 
+def begin_write(session) -> None:
+    """Take the database write lock now, so rows read afterwards stay current until commit.
+
+    pysqlite only opens a transaction at the first INSERT/UPDATE, which leaves a
+    window between a read and the write based on it. PostgreSQL callers use
+    ``SELECT ... FOR UPDATE`` instead, so this is a no-op there.
+    """
+    conn = session.connection()
+    if conn.dialect.name != "sqlite":
+        return
+    raw = conn.connection.driver_connection
+    if not raw.in_transaction:
+        raw.execute("BEGIN IMMEDIATE")
+
+
+def init_db() -> None:
+    """Create missing tables, then missing indexes on tables that already existed.
+
+    ``create_all`` skips existing tables entirely, so indexes added to the models
+    later would never reach an older database without the second pass.
+    """
+    from . import models  # noqa: F401  (registers the tables)
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            present = {ix["name"] for ix in existing.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in present:
+                    index.create(bind=conn)
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,244 @@
+"""Job progress events for the push channel.
+
+Page and job rows are watched through SQLAlchemy session hooks, so every
+committed status change in this process becomes a compact event without the
+workers having to publish anything themselves. When the workers run in another
+process (``WORKER_MODE=external``) a single watcher thread turns row changes into
+the same events, so the database is read once per second per watched job rather
+than once per client poll.
+
+Event ids are ``<epoch>:<seq>``. The epoch changes on every process start and a
+job keeps only its last ``event_buffer_size`` events, so a client resuming from
+an id that can no longer be replayed gets a fresh snapshot instead.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+
+from .config import settings
+from .db import SessionLocal
+from .models import Job, Page
+
+logger = logging.getLogger(__name__)
+
+PAGE_FIELDS = ("status", "error")
+JOB_FIELDS = ("status", "done_pages", "total_pages")
+
+Event = Tuple[int, str, Dict[str, Any]]
+
+
+def page_event(page: Page) -> Dict[str, Any]:
+    return {
+        "id": page.id,
+        "index": page.page_index,
+        "status": page.status,
+        "error": page.error or "",
+    }
+
+
+def job_event(job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "done_pages": job.done_pages or 0,
+        "total_pages": job.total_pages or 0,
+    }
+
+
+class _JobEvents:
+    __slots__ = ("events", "dropped")
+
+    def __init__(self, dropped: int) -> None:
+        self.events: Deque[Event] = deque()
+        # Highest seq no longer buffered; a client behind it needs a snapshot
+        self.dropped = dropped
+
+
+class EventBus:
+    """Per-job ring buffers of events plus wakeups for waiting subscribers."""
+
+    def __init__(self, buffer_size: int, max_jobs: int = 256) -> None:
+        self.epoch = uuid.uuid4().hex[:8]
+        self.buffer_size = max(1, buffer_size)
+        self.max_jobs = max_jobs
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, _JobEvents] = OrderedDict()
+        self._evicted: OrderedDict[str, int] = OrderedDict()
+        self._waiters: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+    def publish(self, job_id: str, kind: str, data: Dict[str, Any]) -> int:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                entry = self._jobs[job_id] = _JobEvents(self._evicted.pop(job_id, 0))
+                while len(self._jobs) > self.max_jobs:
+                    old_id, old = self._jobs.popitem(last=False)
+                    self._evicted[old_id] = old.events[-1][0] if old.events else old.dropped
+                while len(self._evicted) > self.max_jobs * 16:
+                    self._evicted.popitem(last=False)
+            else:
+                self._jobs.move_to_end(job_id)
+            if len(entry.events) >= self.buffer_size:
+                entry.dropped = entry.events.popleft()[0]
+            entry.events.append((seq, kind, data))
+            waiters = list(self._waiters.get(job_id, ()))
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+        return seq
+
+    def current(self) -> int:
+        """Latest issued seq; a snapshot taken now is current up to this id."""
+        with self._lock:
+            return self._seq
+
+    def since(self, job_id: str, seq: int) -> Optional[List[Event]]:
+        """Events after ``seq``; None when some of them can no longer be replayed."""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return None if seq < self._evicted.get(job_id, 0) else []
+            if seq < entry.dropped:
+                return None
+            return [e for e in entry.events if e[0] > seq]
+
+    def parse_id(self, value: Optional[str]) -> Optional[int]:
+        if not value or ":" not in value:
+            return None
+        epoch, _, seq = value.partition(":")
+        if epoch != self.epoch:
+            return None
+        try:
+            return int(seq)
+        except ValueError:
+            return None
+
+    def format_id(self, seq: int) -> str:
+        return f"{self.epoch}:{seq}"
+
+    def subscribe(self, job_id: str) -> asyncio.Event:
+        waiter = asyncio.Event()
+        with self._lock:
+            self._waiters.setdefault(job_id, set()).add((asyncio.get_running_loop(), waiter))
+        if settings.worker_mode == "external":
+            watcher.ensure_started()
+        return waiter
+
+    def unsubscribe(self, job_id: str, waiter: asyncio.Event) -> None:
+        with self._lock:
+            waiters = {w for w in self._waiters.get(job_id, ()) if w[1] is not waiter}
+            if waiters:
+                self._waiters[job_id] = waiters
+            else:
+                self._waiters.pop(job_id, None)
+
+    def watched_jobs(self) -> List[str]:
+        with self._lock:
+            return list(self._waiters)
+
+
+bus = EventBus(settings.event_buffer_size)
+
+
+def _changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+def queue_event(session, job_id: str, kind: str, data: Dict[str, Any]) -> None:
+    """Publish ``data`` once the session's transaction commits."""
+    session.info.setdefault("progress_events", []).append((job_id, kind, data))
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect(session, flush_context) -> None:
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Page) and _changed(obj, PAGE_FIELDS):
+            queue_event(session, obj.job_id, "page", page_event(obj))
+        elif isinstance(obj, Job) and _changed(obj, JOB_FIELDS):
+            queue_event(session, obj.id, "job", job_event(obj))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish(session) -> None:
+    for job_id, kind, data in session.info.pop("progress_events", []):
+        bus.publish(job_id, kind, data)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard(session) -> None:
+    session.info.pop("progress_events", None)
+
+
+class RowWatcher:
+    """Turns page/job row changes made by other processes into events for watched jobs."""
+
+    def __init__(self, interval: float = 1.0) -> None:
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._cursor: Dict[str, datetime] = {}
+        self._seen: Dict[str, Dict[str, Tuple[Any, ...]]] = {}
+
+    def ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="progress-watcher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            jobs = bus.watched_jobs()
+            for job_id in list(self._cursor):
+                if job_id not in jobs:
+                    self._cursor.pop(job_id, None)
+                    self._seen.pop(job_id, None)
+            if not jobs:
+                continue
+            try:
+                self._poll(jobs)
+            except Exception:
+                logger.exception("progress watcher failed")
+
+    def _poll(self, job_ids: List[str]) -> None:
+        db = SessionLocal()
+        try:
+            for job_id in job_ids:
+                cursor = self._cursor.get(job_id)
+                seen = self._seen.setdefault(job_id, {})
+                query = db.query(Page).filter(Page.job_id == job_id)
+                if cursor is not None:
+                    query = query.filter(Page.updated_at >= cursor)
+                latest = cursor
+                for page in query:
+                    state = (page.status, page.error or "")
+                    if seen.get(page.id) != state:
+                        if page.id in seen or cursor is not None:
+                            bus.publish(job_id, "page", page_event(page))
+                        seen[page.id] = state
+                    if page.updated_at and (latest is None or page.updated_at > latest):
+                        latest = page.updated_at
+                job = db.query(Job).filter(Job.id == job_id).first()
+                if job is not None:
+                    state = tuple(getattr(job, name) for name in JOB_FIELDS)
+                    if seen.get(job.id) not in (None, state):
+                        bus.publish(job_id, "job", job_event(job))
+                    seen[job.id] = state
+                self._cursor[job_id] = latest or datetime.utcnow()
+        finally:
+            db.close()
+
+
+watcher = RowWatcher()
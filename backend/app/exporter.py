@@ -0,0 +1,88 @@
+import os
+import zipfile
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from .disk_cache import hash_parts
+from .storage import job_dir
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def export_entries(pages) -> List[Tuple[str, str]]:
+    """(source path, archive name) for every page with a rendered output, in page order."""
+    entries = []
+    for page in sorted(pages, key=lambda p: p.page_index):
+        if page.output_path and Path(page.output_path).is_file():
+            entries.append((page.output_path, Path(page.output_path).name))
+    return entries
+
+
+def export_signature(entries: List[Tuple[str, str]]) -> str:
+    # Outputs are rewritten in place on rerun, so mtime and size are part of the key
+    parts = []
+    for path, arcname in entries:
+        st = os.stat(path)
+        parts.append(f"{arcname}:{path}:{st.st_mtime_ns}:{st.st_size}")
+    return hash_parts(*parts)
+
+
+def export_cache_path(job_id: str, signature: str) -> Path:
+    return job_dir(job_id) / f"export-{signature[:16]}.cbz"
+
+
+class _StreamTee:
+    """Write-only sink for ZipFile that mirrors bytes to a file and a pending-chunk buffer."""
+
+    def __init__(self, f) -> None:
+        self._f = f
+        self._pos = 0
+        self.pending: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._f.write(data)
+        self.pending.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        self._f.flush()
+
+    def drain(self) -> bytes:
+        data = b"".join(self.pending)
+        self.pending.clear()
+        return data
+
+
+def stream_export(entries: List[Tuple[str, str]], cache_path: Path) -> Iterator[bytes]:
+    """Yield a stored (uncompressed) ZIP while writing the same bytes to ``cache_path``.
+
+    The cache file only appears once the archive is complete, so an aborted
+    download never leaves a truncated export behind.
+    """
+    tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{id(entries)}.tmp")
+    complete = False
+    try:
+        with open(tmp, "wb") as f:
+            tee = _StreamTee(f)
+            with zipfile.ZipFile(tee, "w", compression=zipfile.ZIP_STORED) as zf:
+                for path, arcname in entries:
+                    with open(path, "rb") as src, zf.open(arcname, "w", force_zip64=True) as dst:
+                        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                            dst.write(chunk)
+                            yield tee.drain()
+                    yield tee.drain()
+            yield tee.drain()
+        for old in cache_path.parent.glob("export-*.cbz"):
+            old.unlink(missing_ok=True)
+        os.replace(tmp, cache_path)
+        complete = True
+    finally:
+        if not complete:
+            tmp.unlink(missing_ok=True)
@@ -0,0 +1,78 @@
+import io
+import mimetypes
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image
+
+FORMAT_MIME = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "png": "image/png",
+}
+
+
+def guess_mime(path: str) -> str:
+    mime, _ = mimetypes.guess_type(path)
+    return mime or "application/octet-stream"
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime: str
+    width: int
+    height: int
+    orig_width: int
+    orig_height: int
+
+    @property
+    def scale(self) -> float:
+        return self.width / self.orig_width if self.orig_width else 1.0
+
+    def meta(self) -> dict:
+        return {
+            "scale": round(self.scale, 6),
+            "sent_size": [self.width, self.height],
+            "orig_size": [self.orig_width, self.orig_height],
+            "mime": self.mime,
+        }
+
+
+def prepare_for_upload(path: str, max_edge: int, fmt: str, quality: int) -> PreparedImage:
+    """Downscale to ``max_edge`` and re-encode as ``fmt`` ("original" keeps the source encoding).
+
+    bbox_norm is relative to the image, so it stays valid; ``scale`` maps sent
+    pixels back to the original.
+    """
+    raw = Path(path).read_bytes()
+    with Image.open(io.BytesIO(raw)) as img:
+        orig_w, orig_h = img.size
+        long_edge = max(orig_w, orig_h)
+        needs_resize = max_edge > 0 and long_edge > max_edge
+        src_fmt = (img.format or "").lower()
+        target_fmt = src_fmt if fmt == "original" else fmt
+        if target_fmt not in FORMAT_MIME:
+            target_fmt = "png"
+
+        if not needs_resize and target_fmt == src_fmt:
+            return PreparedImage(raw, FORMAT_MIME[target_fmt], orig_w, orig_h, orig_w, orig_h)
+
+        out = img
+        if needs_resize:
+            ratio = max_edge / long_edge
+            size = (max(1, round(orig_w * ratio)), max(1, round(orig_h * ratio)))
+            out = img.resize(size, Image.Resampling.LANCZOS)
+        if target_fmt == "jpeg" and out.mode not in ("RGB", "L"):
+            out = out.convert("RGB")
+        elif out.mode == "P":
+            out = out.convert("RGBA")
+
+        buf = io.BytesIO()
+        if target_fmt == "png":
+            out.save(buf, format="PNG", optimize=True)
+        else:
+            out.save(buf, format=target_fmt.upper(), quality=quality)
+        return PreparedImage(
+            buf.getvalue(), FORMAT_MIME[target_fmt], out.width, out.height, orig_w, orig_h
+        )
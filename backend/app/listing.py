@@ -0,0 +1,82 @@
+"""Keyset pagination and field projection for the list endpoints.
+
+A cursor is the sort key of the last row returned, so the next page is a plain
+index range scan no matter how deep the client has paged, and rows inserted in
+between never shift or repeat what has already been seen.
+"""
+import base64
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> List[str]:
+    """Requested fields in model order; every allowed field when ``fields`` is empty."""
+    allowed = list(allowed)
+    if not fields:
+        return allowed
+    wanted = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(wanted - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return [name for name in allowed if name in wanted]
+
+
+def parse_list(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def json_contains_like(value: str) -> str:
+    """LIKE pattern matching ``value`` as one element of a JSON string array column.
+
+    The element is matched with its quotes, and quotes inside stored strings are
+    escaped, so a tag never matches part of a longer one.
+    """
+    return contains_like(json.dumps(value))
+
+
+def contains_like(value: str) -> str:
+    """LIKE pattern matching ``value`` anywhere in a column, for a backslash escape char."""
+    return "%" + value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def after(columns: Sequence, values: Sequence[Any], descending: bool = False):
+    """Rows strictly after ``values`` in (col1, col2, ...) order.
+
+    Written as nested OR/AND rather than a row-value comparison so it works on
+    every backend and still uses the composite index.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*[columns[j] == values[j] for j in range(i)], step))
+    return or_(*clauses)
+
+
+def page_of(rows: List[Any], fields: List[str], limit: int, key) -> Dict[str, Any]:
+    """``{"items", "next_cursor"}`` from up to ``limit + 1`` fetched rows."""
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [{name: getattr(row, name) for name in fields} for row in rows]
+    next_cursor = encode_cursor(key(rows[-1])) if more and rows else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -1,15 +1,29 @@
+import asyncio
 import base64
 import json
+import mimetypes
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import httpx
 
 from .config import settings
+from .imaging import guess_mime
 
+_clients: Dict[str, httpx.Client] = {}
+_async_clients: Dict[Tuple[int, str], httpx.AsyncClient] = {}
+_clients_lock = threading.Lock()
 
-def _image_to_b64(path: str) -> str:
-    data = Path(path).read_bytes()
-    return base64.b64encode(data).decode("utf-8")
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+
+def _data_url(data: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
 
 
 def _join_url(base: str, path: str) -> str:
@@ -23,51 +37,316 @@ def _headers(api_key: str) -> Dict[str, str]:
     return {"Authorization": f"Bearer {api_key}"}
 
 
-def _request_with_retry(url: str, headers: dict, payload: dict, timeout: int, retries: int) -> dict:
-    last_err = None
-    for attempt in range(retries + 1):
+def _http2_available() -> bool:
+    if not settings.http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _origin(url: str) -> str:
+    u = httpx.URL(url)
+    return f"{u.scheme}://{u.netloc.decode('ascii')}"
+
+
+def _get_client(url: str) -> httpx.Client:
+    # One long-lived pooled client per upstream origin, shared by all worker threads
+    key = _origin(url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            )
+            client = httpx.Client(limits=limits, http2=_http2_available())
+            _clients[key] = client
+    return client
+
+
+def _get_async_client(url: str) -> httpx.AsyncClient:
+    # Async clients are bound to the loop that created them
+    key = (id(asyncio.get_running_loop()), _origin(url))
+    with _clients_lock:
+        client = _async_clients.get(key)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=settings.async_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            )
+            client = httpx.AsyncClient(limits=limits, http2=_http2_available())
+            _async_clients[key] = client
+    return client
+
+
+def close_clients() -> None:
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+async def aclose_clients() -> None:
+    loop_id = id(asyncio.get_running_loop())
+    with _clients_lock:
+        keys = [key for key in _async_clients if key[0] == loop_id]
+        clients = [_async_clients.pop(key) for key in keys]
+    for client in clients:
+        await client.aclose()
+
+
+class AdaptiveLimiter:
+    """AIMD limit on in-flight requests to one upstream endpoint.
+
+    Every success grows the limit by roughly one slot per window; a throttling
+    response halves it and pauses new requests until ``Retry-After`` elapses.
+    ``acquire`` returns the current epoch, and throttles on requests acquired
+    before the last decrease are ignored, so a burst of 429s halves the limit once.
+    Threads wait on a condition and coroutines on a future; both are woken by
+    ``release`` rather than polling.
+    """
+
+    def __init__(self, min_limit: int, max_limit: int) -> None:
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._epoch = 0
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def acquire(self) -> int:
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return self._epoch
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    async def acquire_async(self) -> int:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return self._epoch
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+            try:
+                # The lock is never held across the await, so the event loop stays free
+                await asyncio.wait({waiter[1]}, timeout=wait if wait > 0 else None)
+            finally:
+                with self._cond:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+
+    def release(
+        self, epoch: int, ok: bool, throttled: bool = False, retry_after: float | None = None
+    ) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                if epoch == self._epoch:
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._epoch += 1
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            elif ok:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def _get_limiter(url: str) -> AdaptiveLimiter:
+    with _clients_lock:
+        limiter = _limiters.get(url)
+        if limiter is None:
+            limiter = AdaptiveLimiter(
+                settings.upstream_min_concurrency, settings.upstream_max_concurrency
+            )
+            _limiters[url] = limiter
+    return limiter
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _is_retryable(err: Exception) -> bool:
+    if isinstance(err, httpx.HTTPStatusError):
+        return err.response.status_code in RETRYABLE_STATUS
+    return isinstance(err, httpx.TransportError)
+
+
+def _backoff_delay(attempt: int, retry_after: float | None) -> float:
+    # Full jitter, but never earlier than the server asked for
+    cap = min(settings.backoff_max, settings.backoff_base * (2**attempt))
+    delay = random.uniform(0, cap)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, settings.backoff_max))
+    return delay
+
+
+def _post_with_retry(url: str, timeout: int, retries: int, **kwargs) -> dict:
+    client = _get_client(url)
+    limiter = _get_limiter(url)
+    attempt = 0
+    while True:
+        resp = None
+        retry_after = None
+        epoch = limiter.acquire()
         try:
-            with httpx.Client(timeout=timeout) as client:
-                resp = client.post(url, headers=headers, json=payload)
+            resp = client.post(url, timeout=timeout, **kwargs)
+            if resp.status_code in THROTTLE_STATUS:
+                retry_after = _retry_after(resp)
+        except Exception as e:
+            err = e
+        finally:
+            limiter.release(
+                epoch,
+                ok=resp is not None and resp.is_success,
+                throttled=resp is not None and resp.status_code in THROTTLE_STATUS,
+                retry_after=retry_after,
+            )
+        if resp is not None:
+            try:
                 resp.raise_for_status()
                 return resp.json()
-        except Exception as e:
-            last_err = e
-    raise last_err
+            except Exception as e:
+                err = e
+        if attempt >= retries or not _is_retryable(err):
+            raise err
+        time.sleep(_backoff_delay(attempt, retry_after))
+        attempt += 1
 
 
-def _request_with_retry_multipart(url: str, headers: dict, data: dict, files: dict, timeout: int, retries: int) -> dict:
-    last_err = None
-    for attempt in range(retries + 1):
+async def _post_with_retry_async(url: str, timeout: int, retries: int, **kwargs) -> dict:
+    client = _get_async_client(url)
+    limiter = _get_limiter(url)
+    attempt = 0
+    while True:
+        resp = None
+        retry_after = None
+        epoch = await limiter.acquire_async()
         try:
-            with httpx.Client(timeout=timeout) as client:
-                resp = client.post(url, headers=headers, data=data, files=files)
+            resp = await client.post(url, timeout=timeout, **kwargs)
+            if resp.status_code in THROTTLE_STATUS:
+                retry_after = _retry_after(resp)
+        except Exception as e:
+            err = e
+        finally:
+            limiter.release(
+                epoch,
+                ok=resp is not None and resp.is_success,
+                throttled=resp is not None and resp.status_code in THROTTLE_STATUS,
+                retry_after=retry_after,
+            )
+        if resp is not None:
+            try:
                 resp.raise_for_status()
                 return resp.json()
-        except Exception as e:
-            last_err = e
-    raise last_err
+            except Exception as e:
+                err = e
+        if attempt >= retries or not _is_retryable(err):
+            raise err
+        await asyncio.sleep(_backoff_delay(attempt, retry_after))
+        attempt += 1
 
 
 def _resolve(cfg: dict, key: str, default: Any) -> Any:
     return cfg.get(key, default)
 
 
-def call_stage_a(
-    image_path: str,
+def _batch_schema(schema: dict, keys: List[str]) -> dict:
+    # One copy of the page schema per key, under {"pages": {key: page}}
+    page_schema = schema.get("schema", schema)
+    return {
+        **{k: v for k, v in schema.items() if k != "schema"},
+        "name": f"{schema.get('name', 'stage_a')}_batch",
+        "schema": {
+            "type": "object",
+            "required": ["pages"],
+            "properties": {
+                "pages": {
+                    "type": "object",
+                    "required": keys,
+                    "properties": {key: page_schema for key in keys},
+                }
+            },
+        },
+    }
+
+
+def _stage_a_request(
+    image_path: Optional[str],
     prompt: str,
     context_text: str,
     schema: Optional[dict],
     cfg: dict,
     api_key: str,
-) -> Dict[str, Any]:
+    image_bytes: Optional[bytes],
+    image_mime: Optional[str],
+    batch: Optional[List[dict]] = None,
+) -> Tuple[str, dict, int, int]:
     base_url = _resolve(cfg, "openai_base_url", settings.openai_base_url)
     model = _resolve(cfg, "model_a", settings.model_a)
     protocol = _resolve(cfg, "model_a_protocol", settings.model_a_protocol)
     timeout = int(_resolve(cfg, "stage_a_timeout", settings.stage_a_timeout))
     retries = int(_resolve(cfg, "retries", settings.retries))
 
-    b64 = _image_to_b64(image_path)
+    if batch:
+        content = [{"type": "text", "text": context_text}] if context_text else []
+        for page in batch:
+            content.append(
+                {"type": "text", "text": f"[page {page['key']}]\n{page.get('context_text', '')}"}
+            )
+            image_url = _data_url(page["image_bytes"], page["image_mime"])
+            content.append({"type": "image_url", "image_url": {"url": image_url}})
+        if schema:
+            schema = _batch_schema(schema, [page["key"] for page in batch])
+    else:
+        if image_bytes is None:
+            image_bytes = Path(image_path).read_bytes()
+            image_mime = guess_mime(image_path)
+        image_url = _data_url(image_bytes, image_mime or "image/png")
+        content = [
+            {"type": "text", "text": context_text},
+            {"type": "image_url", "image_url": {"url": image_url}},
+        ]
 
     if protocol == "responses":
         payload = {
@@ -79,10 +358,7 @@ def call_stage_a(
                 },
                 {
                     "role": "user",
-                    "content": [
-                        {"type": "text", "text": context_text},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}},
-                    ],
+                    "content": content,
                 },
             ],
             "temperature": 0.2,
@@ -97,10 +373,7 @@ def call_stage_a(
                 {"role": "system", "content": prompt},
                 {
                     "role": "user",
-                    "content": [
-                        {"type": "text", "text": context_text},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}},
-                    ],
+                    "content": content,
                 },
             ],
             "temperature": 0.2,
@@ -109,8 +382,10 @@ def call_stage_a(
             payload["response_format"] = {"type": "json_schema", "json_schema": schema}
         url = _join_url(base_url, "/v1/chat/completions")
 
-    data = _request_with_retry(url, _headers(api_key), payload, timeout, retries)
+    return url, {"headers": _headers(api_key), "json": payload}, timeout, retries
+
 
+def _parse_stage_a(data: dict) -> Dict[str, Any]:
     content = None
     if "choices" in data:
         content = data["choices"][0]["message"]["content"]
@@ -132,7 +407,73 @@ def call_stage_a(
         raise
 
 
-def call_stage_b(image_path: str, prompt: str, json_payload: Dict[str, Any], cfg: dict, api_key: str) -> bytes:
+def _parse_stage_a_batch(data: dict) -> Dict[str, Any]:
+    pages = _parse_stage_a(data).get("pages")
+    if not isinstance(pages, dict):
+        raise ValueError("Batched model A response has no pages object")
+    return pages
+
+
+def call_stage_a(
+    image_path: Optional[str],
+    prompt: str,
+    context_text: str,
+    schema: Optional[dict],
+    cfg: dict,
+    api_key: str,
+    image_bytes: Optional[bytes] = None,
+    image_mime: Optional[str] = None,
+    batch: Optional[List[dict]] = None,
+) -> Dict[str, Any]:
+    """Run Stage A on one page, or on several in one request when ``batch`` is given.
+
+    Batch entries are dicts with ``key``, ``image_bytes``, ``image_mime`` and
+    ``context_text``; ``image_path`` is then unused and the raw per-page results
+    are returned keyed by ``key``. Callers validate each page themselves.
+    """
+    url, request, timeout, retries = _stage_a_request(
+        image_path, prompt, context_text, schema, cfg, api_key, image_bytes, image_mime, batch
+    )
+    data = _post_with_retry(url, timeout, retries, **request)
+    return _parse_stage_a_batch(data) if batch else _parse_stage_a(data)
+
+
+async def call_stage_a_async(
+    image_path: Optional[str],
+    prompt: str,
+    context_text: str,
+    schema: Optional[dict],
+    cfg: dict,
+    api_key: str,
+    image_bytes: Optional[bytes] = None,
+    image_mime: Optional[str] = None,
+    batch: Optional[List[dict]] = None,
+) -> Dict[str, Any]:
+    url, request, timeout, retries = await asyncio.to_thread(
+        _stage_a_request,
+        image_path,
+        prompt,
+        context_text,
+        schema,
+        cfg,
+        api_key,
+        image_bytes,
+        image_mime,
+        batch,
+    )
+    data = await _post_with_retry_async(url, timeout, retries, **request)
+    return _parse_stage_a_batch(data) if batch else _parse_stage_a(data)
+
+
+def _stage_b_request(
+    image_path: str,
+    prompt: str,
+    json_payload: Dict[str, Any],
+    cfg: dict,
+    api_key: str,
+    image_bytes: Optional[bytes] = None,
+    image_mime: Optional[str] = None,
+) -> Tuple[str, dict, int, int, str]:
     base_url = _resolve(cfg, "openai_base_url", settings.openai_base_url)
     model = _resolve(cfg, "model_b", settings.model_b)
     protocol = _resolve(cfg, "model_b_protocol", settings.model_b_protocol)
@@ -141,23 +482,31 @@ def call_stage_b(image_path: str, prompt: str, json_payload: Dict[str, Any], cfg
     retries = int(_resolve(cfg, "retries", settings.retries))
 
     json_text = json.dumps(json_payload, ensure_ascii=False)
+    filename = Path(image_path).name
+    if image_bytes is None:
+        image_bytes = Path(image_path).read_bytes()
+        image_mime = guess_mime(image_path)
+    else:
+        # A region crop is sent in place of the page file
+        filename = f"{Path(image_path).stem}-region{mimetypes.guess_extension(image_mime) or ''}"
 
     if protocol == "images_edits":
         url = _join_url(base_url, endpoint)
-        image_bytes = Path(image_path).read_bytes()
-        files = {"image": ("image.png", image_bytes, "application/octet-stream")}
+        files = {"image": (filename, image_bytes, image_mime)}
         data = {
             "model": model,
             "prompt": f"{prompt}\n\nJSON:\n{json_text}",
             "response_format": "b64_json",
         }
-        res = _request_with_retry_multipart(url, _headers(api_key), data, files, timeout, retries)
-        b64 = res["data"][0].get("b64_json")
-        if not b64:
-            raise ValueError("No image data returned from model B")
-        return base64.b64decode(b64)
+        return (
+            url,
+            {"headers": _headers(api_key), "data": data, "files": files},
+            timeout,
+            retries,
+            protocol,
+        )
 
-    b64 = _image_to_b64(image_path)
+    image_url = _data_url(image_bytes, image_mime)
     payload = {
         "model": model,
         "input": [
@@ -166,14 +515,22 @@ def call_stage_b(image_path: str, prompt: str, json_payload: Dict[str, Any], cfg
                 "role": "user",
                 "content": [
                     {"type": "text", "text": f"JSON:\n{json_text}"},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}},
+                    {"type": "image_url", "image_url": {"url": image_url}},
                 ],
             },
         ],
         "response_format": {"type": "image"},
     }
     url = _join_url(base_url, "/v1/responses")
-    res = _request_with_retry(url, _headers(api_key), payload, timeout, retries)
+    return url, {"headers": _headers(api_key), "json": payload}, timeout, retries, protocol
+
+
+def _parse_stage_b(res: dict, protocol: str) -> bytes:
+    if protocol == "images_edits":
+        b64 = res["data"][0].get("b64_json")
+        if not b64:
+            raise ValueError("No image data returned from model B")
+        return base64.b64decode(b64)
 
     if "output" in res:
         for block in res["output"]:
@@ -184,3 +541,33 @@ def call_stage_b(image_path: str, prompt: str, json_payload: Dict[str, Any], cfg
                     raise ValueError("Image URL returned; configure downloader in gateway.")
 
     raise ValueError("No image data returned from model B")
+
+
+def call_stage_b(
+    image_path: str,
+    prompt: str,
+    json_payload: Dict[str, Any],
+    cfg: dict,
+    api_key: str,
+    image_bytes: Optional[bytes] = None,
+    image_mime: Optional[str] = None,
+) -> bytes:
+    url, request, timeout, retries, protocol = _stage_b_request(
+        image_path, prompt, json_payload, cfg, api_key, image_bytes, image_mime
+    )
+    return _parse_stage_b(_post_with_retry(url, timeout, retries, **request), protocol)
+
+
+async def call_stage_b_async(
+    image_path: str,
+    prompt: str,
+    json_payload: Dict[str, Any],
+    cfg: dict,
+    api_key: str,
+    image_bytes: Optional[bytes] = None,
+    image_mime: Optional[str] = None,
+) -> bytes:
+    url, request, timeout, retries, protocol = await asyncio.to_thread(
+        _stage_b_request, image_path, prompt, json_payload, cfg, api_key, image_bytes, image_mime
+    )
+    return _parse_stage_b(await _post_with_retry_async(url, timeout, retries, **request), protocol)
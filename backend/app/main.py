@@ -4,12 +4,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from .config import settings
-from .db import engine
-from .models import Base
+from .db import init_db
+from .progress import backfill_counts
 from .routes import jobs, pages, settings as settings_routes
-from .queue import shutdown_queues
+from .queue import start_queues, shutdown_queues
+from .thumbnails import derivatives
 
-Base.metadata.create_all(bind=engine)
+init_db()
+backfill_counts()
 
 app = FastAPI(title=settings.app_name)
 
@@ -31,9 +33,16 @@ def health():
     return {"status": "ok"}
 
 
+@app.on_event("startup")
+def _startup():
+    if settings.worker_mode != "external":
+        start_queues()
+
+
 @app.on_event("shutdown")
 def _shutdown():
     shutdown_queues()
+    derivatives.shutdown()
 
 
 static_dir = Path(__file__).resolve().parent / "static"
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, DateTime, String, Integer, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, DateTime, String, Integer, ForeignKey, Index, JSON, Boolean
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -8,6 +8,8 @@ from .db import Base
 class Job(Base):
     __tablename__ = "jobs"
 
+    __table_args__ = (Index("ix_jobs_created_at_id", "created_at", "id"),)
+
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, default="")
     status = Column(String, default="queued")
@@ -30,10 +32,12 @@ class Job(Base):
 class Page(Base):
     __tablename__ = "pages"
 
+    __table_args__ = (Index("ix_pages_job_id_page_index", "job_id", "page_index"),)
+
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    job_id = Column(String, ForeignKey("jobs.id"))
+    job_id = Column(String, ForeignKey("jobs.id"), index=True)
     page_index = Column(Integer, default=0)
-    status = Column(String, default="queued")
+    status = Column(String, default="queued", index=True)
     error = Column(String, default="")
 
     original_path = Column(String, default="")
@@ -47,6 +51,16 @@ class Page(Base):
     job = relationship("Job", back_populates="pages")
 
 
+class JobStatusCount(Base):
+    """Pages per status for a job, kept in step with page transitions (see app.progress)."""
+
+    __tablename__ = "job_status_counts"
+
+    job_id = Column(String, ForeignKey("jobs.id"), primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+
 class GlobalSettings(Base):
     __tablename__ = "global_settings"
 
@@ -56,3 +70,25 @@ class GlobalSettings(Base):
     api_key_last4 = Column(String, default="")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Task(Base):
+    __tablename__ = "tasks"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    queue = Column(String, index=True)
+    fn = Column(String, default="")
+    page_id = Column(String, index=True)
+    job_id = Column(String, index=True)
+    priority = Column(Integer, default=0)
+    page_index = Column(Integer, default=0)
+    kwargs = Column(JSON, default=dict)
+    status = Column(String, default="queued", index=True)  # queued | running | done | failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    lease_owner = Column(String, default="")
+    lease_expires_at = Column(DateTime, nullable=True)
+    error = Column(String, default="")
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,114 @@
+"""Job-wide access to page JSON for batch review and editing.
+
+``iter_job_json`` streams one JSON document built page by page, so memory stays
+flat however many pages a job has. In the pages view the stored files are
+copied through verbatim instead of being parsed and re-serialized.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ItemFilter = Dict[str, Any]
+
+
+def item_matches(item: dict, filters: ItemFilter) -> bool:
+    confirm = filters.get("needs_user_confirm")
+    if confirm is not None and bool(item.get("needs_user_confirm")) != confirm:
+        return False
+    types = filters.get("types")
+    if types and item.get("type") not in types:
+        return False
+    max_confidence = filters.get("max_confidence")
+    if max_confidence is not None:
+        try:
+            if float(item.get("confidence", 0)) > max_confidence:
+                return False
+        except (TypeError, ValueError):
+            pass
+    return True
+
+
+def iter_job_json(
+    job_id: str, pages: Sequence[Tuple[str, int, str, str]], view: str, filters: ItemFilter
+) -> Iterator[bytes]:
+    """Stream ``{"job_id", "pages": [...]}`` or ``{"job_id", "items": [...]}``.
+
+    ``pages`` holds (id, page_index, status, json_path); pages without a JSON file
+    yet are left out, and so are unreadable files in the items view.
+    """
+    key = "items" if view == "items" else "pages"
+    yield f'{{"job_id":{json.dumps(job_id)},"{key}":['.encode("utf-8")
+    first = True
+    for page_id, page_index, status, json_path in pages:
+        try:
+            text = Path(json_path).read_text(encoding="utf-8") if json_path else None
+        except FileNotFoundError:
+            text = None
+        if text is None:
+            continue
+        if view == "items":
+            try:
+                content = json.loads(text)
+            except json.JSONDecodeError as e:
+                # The response has already started, so one bad file must not end it
+                logger.warning("Skipping page %s with invalid JSON: %s", page_id, e)
+                continue
+            for item in content.get("items", []):
+                if not item_matches(item, filters):
+                    continue
+                entry = {"page_id": page_id, "page_index": page_index, "item": item}
+                chunk = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+                yield (b"" if first else b",") + chunk
+                first = False
+        else:
+            head = {"id": page_id, "page_index": page_index, "status": status}
+            prefix = json.dumps(head, ensure_ascii=False)[:-1] + ',"content":'
+            yield ((b"" if first else b",") + f"{prefix}{text}}}".encode("utf-8"))
+            first = False
+    yield b"]}"
+
+
+def merge_items(content: dict, patches: Iterable[dict]) -> dict:
+    """Apply item patches (each with an ``id``) to a copy of ``content``.
+
+    Raises KeyError for an item id the page does not have.
+    """
+    items = [dict(item) for item in content.get("items", [])]
+    by_id = {item.get("id"): item for item in items}
+    for patch in patches:
+        item = by_id.get(patch.get("id"))
+        if item is None:
+            raise KeyError(patch.get("id"))
+        item.update(patch)
+    return {**content, "items": items}
+
+
+def write_json_files(docs: List[Tuple[str, dict]]) -> None:
+    """Write every (path, content) pair, replacing the files only after all are written."""
+    staged = []
+    try:
+        for path, content in docs:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            Path(tmp).write_text(
+                json.dumps(content, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+            staged.append((tmp, path))
+        for tmp, path in staged:
+            os.replace(tmp, path)
+        staged = []
+    finally:
+        for tmp, _ in staged:
+            Path(tmp).unlink(missing_ok=True)
+
+
+def load_json(path: Optional[str]) -> Optional[dict]:
+    if not path:
+        return None
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,117 @@
+"""Coalesced page status writes.
+
+Workers used to commit every status transition on their own, so ten threads
+meant ten competing write transactions for a few bytes each (and ``database is
+locked`` on SQLite). Writes submitted here are merged and
+applied by one thread in a single transaction every ``write_coalesce_ms``.
+
+Status writes are conditional: they only apply while the page still has the
+status the caller read. Workers commit other columns (``meta``) while a marker
+is pending, so the check is on ``status`` rather than ``updated_at``. Workers set
+a page's final status through ``finalize``, which settles the marker first and
+always writes the status, even when it equals the one the worker loaded (the
+marker may already be in the row while the session copy still says ``done``).
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.attributes import flag_modified
+
+from .config import settings
+from .db import SessionLocal, begin_write
+from .models import Page
+
+logger = logging.getLogger(__name__)
+
+
+class PageWriter:
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._statuses: Dict[str, Tuple[str, Optional[str]]] = {}
+        self._writing: Set[str] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._flushing = False
+
+    def set_status(self, page_id: str, status: str, expected: Optional[str]) -> None:
+        """Queue ``status`` for a page whose status is still ``expected`` when written."""
+        with self._cond:
+            self._statuses[page_id] = (status, expected)
+            self._wake()
+
+    def settle(self, page_id: str, timeout: float = 10.0) -> None:
+        """Drop a pending write for the page, or wait for one that is being written."""
+        with self._cond:
+            self._statuses.pop(page_id, None)
+            self._cond.wait_for(lambda: page_id not in self._writing, timeout=timeout)
+            # A busy flush puts its writes back before it finishes
+            self._statuses.pop(page_id, None)
+
+    def finalize(self, page: Page, status: str) -> None:
+        """Set a page's final status on the caller's session, replacing any running marker."""
+        self.settle(page.id)
+        page.status = status
+        # Equal to the loaded value is not "unchanged": the row may hold a marker by now
+        flag_modified(page, "status")
+
+    def _wake(self) -> None:
+        # Caller holds the lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="page-writer", daemon=True)
+            self._thread.start()
+        self._cond.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything queued so far is written."""
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: not (self._statuses or self._flushing), timeout=timeout
+            )
+
+    def _run(self) -> None:
+        interval = max(0, settings.write_coalesce_ms) / 1000
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._statuses)
+            # Let writes from other workers pile up for one window
+            time.sleep(interval)
+            with self._cond:
+                statuses, self._statuses = self._statuses, {}
+                self._writing = set(statuses)
+                self._flushing = True
+            try:
+                self._write(statuses)
+            except OperationalError:
+                logger.warning("page writer: database busy, retrying %d writes", len(statuses))
+                with self._cond:
+                    for page_id, value in statuses.items():
+                        self._statuses.setdefault(page_id, value)
+            except Exception:
+                logger.exception("page writer: dropped %d writes", len(statuses))
+            finally:
+                with self._cond:
+                    self._writing = set()
+                    self._flushing = False
+                    self._cond.notify_all()
+
+    def _write(self, statuses: Dict[str, Tuple[str, Optional[str]]]) -> None:
+        db = SessionLocal()
+        try:
+            # Compare-and-set: the rows must not change between this read and the commit
+            begin_write(db)
+            for page in db.query(Page).filter(Page.id.in_(list(statuses))).with_for_update():
+                status, expected = statuses[page.id]
+                if expected is None or page.status == expected:
+                    page.status = status
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+page_writer = PageWriter()
@@ -0,0 +1,175 @@
+"""Per-status page counters for jobs.
+
+Every page status transition flushed through SessionLocal adjusts
+``job_status_counts`` (and ``jobs.done_pages``) with atomic increments inside the
+same transaction, so progress never needs a COUNT over the pages table and
+concurrent workers cannot overwrite each other's totals. The job's ``done``
+status follows ``done_pages`` both ways.
+"""
+from collections import Counter
+from typing import Dict, Tuple
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, begin_write
+from .events import job_event, queue_event
+from .models import Job, JobStatusCount, Page
+
+# Page status -> (stage, bucket) for the status endpoint
+STAGE_BUCKETS = {
+    "queued": ("A", "queued"),
+    "A_running": ("A", "running"),
+    "A_done": ("B", "queued"),
+    "B_running": ("B", "running"),
+    "done": ("B", "done"),
+}
+
+
+def _status_deltas(session: Session) -> Counter:
+    deltas: Counter = Counter()
+    for obj in session.new:
+        if isinstance(obj, Page):
+            deltas[(obj.job_id, obj.status or "queued")] += 1
+
+    changed = {
+        obj.id: obj
+        for obj in session.dirty
+        if isinstance(obj, Page) and inspect(obj).attrs.status.history.added
+    }
+    deleted = {obj.id: obj for obj in session.deleted if isinstance(obj, Page)}
+    if changed or deleted:
+        # The session's copy of a row may be stale (another worker moved the page on
+        # in between), so transitions start from the status stored right now
+        begin_write(session)
+        rows = session.execute(
+            select(Page.id, Page.status)
+            .where(Page.id.in_(list(changed) + list(deleted)))
+            .with_for_update()
+        )
+        current = dict(rows.all())
+        for page_id, obj in changed.items():
+            old, new = current.get(page_id), obj.status
+            if old != new:
+                if old is not None:
+                    deltas[(obj.job_id, old)] -= 1
+                deltas[(obj.job_id, new)] += 1
+        for page_id, obj in deleted.items():
+            if page_id in current:
+                deltas[(obj.job_id, current[page_id] or "queued")] -= 1
+    return deltas
+
+
+def _bump(conn, job_id: str, status: str, delta: int) -> None:
+    dialect = conn.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(JobStatusCount).values(job_id=job_id, status=status, count=delta)
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[JobStatusCount.job_id, JobStatusCount.status],
+                set_={"count": JobStatusCount.count + delta},
+            )
+        )
+        return
+    updated = conn.execute(
+        update(JobStatusCount)
+        .where(JobStatusCount.job_id == job_id, JobStatusCount.status == status)
+        .values(count=JobStatusCount.count + delta)
+    ).rowcount
+    if not updated:
+        conn.execute(
+            JobStatusCount.__table__.insert().values(job_id=job_id, status=status, count=delta)
+        )
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _apply_counts(session: Session, flush_context, instances) -> None:
+    deltas = _status_deltas(session)
+    if not any(deltas.values()):
+        return
+    conn = session.connection()
+    done: Dict[str, int] = Counter()
+    for (job_id, status), delta in deltas.items():
+        if not delta or not job_id:
+            continue
+        _bump(conn, job_id, status, delta)
+        if status == "done":
+            done[job_id] += delta
+    for job_id, delta in done.items():
+        if not delta:
+            continue
+        conn.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(done_pages=func.coalesce(Job.done_pages, 0) + delta)
+        )
+        if delta > 0:
+            conn.execute(
+                update(Job)
+                .where(
+                    Job.id == job_id,
+                    Job.total_pages > 0,
+                    Job.done_pages >= Job.total_pages,
+                    Job.status != "done",
+                )
+                .values(status="done")
+            )
+        else:
+            # A finished page went back to work (requeue, JSON edit), so the job is running again
+            conn.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "done", Job.done_pages < Job.total_pages)
+                .values(status="running")
+            )
+        row = conn.execute(
+            select(Job.id, Job.status, Job.done_pages, Job.total_pages).where(Job.id == job_id)
+        ).first()
+        if row is not None:
+            queue_event(session, job_id, "job", job_event(row))
+
+
+def counts(db: Session, job_id: str) -> Dict[str, int]:
+    rows = db.query(JobStatusCount.status, JobStatusCount.count).filter(
+        JobStatusCount.job_id == job_id
+    )
+    return {status: n for status, n in rows if n}
+
+
+def stage_counts(status_counts: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    stages: Dict[str, Dict[str, int]] = {
+        "A": {"queued": 0, "running": 0, "done": 0},
+        "B": {"queued": 0, "running": 0, "done": 0},
+    }
+    for status, n in status_counts.items():
+        bucket: Tuple[str, str] | None = STAGE_BUCKETS.get(status)
+        if bucket:
+            stages[bucket[0]][bucket[1]] += n
+        if status not in ("queued", "A_running", "failed"):
+            # Everything past Stage A (including blocked) has its JSON
+            stages["A"]["done"] += n
+    return stages
+
+
+def backfill_counts() -> int:
+    """Build counters for jobs created before they existed; returns the number of jobs filled."""
+    db = SessionLocal()
+    try:
+        have = select(JobStatusCount.job_id).distinct()
+        rows = (
+            db.query(Page.job_id, Page.status, func.count(Page.id))
+            .filter(Page.job_id.notin_(have))
+            .group_by(Page.job_id, Page.status)
+            .all()
+        )
+        jobs = set()
+        for job_id, status, n in rows:
+            db.add(JobStatusCount(job_id=job_id, status=status or "queued", count=n))
+            jobs.add(job_id)
+        db.commit()
+        return len(jobs)
+    finally:
+        db.close()
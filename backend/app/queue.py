@@ -1,8 +1,48 @@
+import asyncio
+import bisect
+import functools
 import importlib
-from concurrent.futures import ThreadPoolExecutor
-from typing import Callable, Any
+import itertools
+import logging
+import math
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Any, Dict, List, Optional, Tuple
 
+from sqlalchemy import case, func
+
+from . import async_runtime
 from .config import settings
+from .db import SessionLocal, begin_write
+from .models import Job, Page, Task
+from .page_writer import page_writer
+
+logger = logging.getLogger(__name__)
+
+# Unique per process start, so a restarted container never mistakes old leases for its own
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _lease_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.task_lease_seconds)
+
+
+def _callable_path(fn: str | Callable[..., Any]) -> str:
+    if isinstance(fn, str):
+        return fn
+    return f"{fn.__module__}.{fn.__name__}"
+
+
+def _async_variant(fn: Callable[..., Any]) -> Optional[Callable[..., Any]]:
+    """``<name>_async`` next to a task function, used by the asyncio runtime when present."""
+    module = importlib.import_module(fn.__module__) if getattr(fn, "__module__", None) else None
+    variant = getattr(module, f"{fn.__name__}_async", None) if module else None
+    return variant if asyncio.iscoroutinefunction(variant) else None
 
 
 def _resolve_callable(path_or_callable: str | Callable[..., Any]) -> Callable[..., Any]:
@@ -34,11 +74,946 @@ class SimpleQueue:
         self.executor.shutdown(wait=False)
 
 
-queue_stage_a = SimpleQueue(settings.queue_stage_a, settings.stage_a_concurrency)
-queue_stage_b = SimpleQueue(settings.queue_stage_b, settings.stage_b_concurrency)
+@dataclass(order=True)
+class PageTask:
+    sort_key: Tuple[int, ...]
+    task_id: str = field(compare=False)
+    page_id: str = field(compare=False)
+    job_id: str = field(compare=False)
+    priority: int = field(compare=False)
+    fn: Callable[..., Any] = field(compare=False)
+    kwargs: Dict[str, Any] = field(compare=False)
+    future: Future = field(compare=False)
+    page_index: int = field(default=0, compare=False)
+    # Page index that must finish first (wave scheduling), None when the task can start any time
+    after: Optional[int] = field(default=None, compare=False)
+    # Pages covered, starting at page_index (batched Stage A runs several in one task)
+    width: int = field(default=1, compare=False)
+
+    @property
+    def is_preview(self) -> bool:
+        return self.sort_key[0] == 0
+
+
+class FairScheduler:
+    """Pick order for page tasks: job priority first, preview pages next, then round-robin by job.
+
+    Within a job pages run in page order, or in waves when the job has a wave span:
+    the job is cut into segments of ``span`` pages that advance side by side, and a
+    page waits until the page before it in its segment has finished. Not thread-safe;
+    FairQueue holds the lock.
+    """
+
+    def __init__(self, preview_pages: int) -> None:
+        self.preview_pages = preview_pages
+        self._seq = itertools.count()
+        self._jobs: Dict[str, List[PageTask]] = {}
+        self._last_served: Dict[str, int] = {}
+        self._turn = itertools.count(1)
+        self.pending: Dict[str, PageTask] = {}
+        self.spans: Dict[str, int] = {}
+        # Page indexes per job that are queued or running
+        self._outstanding: Dict[str, Dict[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def make_task(
+        self,
+        task_id: str,
+        fn,
+        page_id: str,
+        job_id: str,
+        priority: int,
+        page_index: int,
+        kwargs: dict,
+    ) -> PageTask:
+        preview = 0 if page_index <= self.preview_pages else 1
+        span = self.spans.get(job_id)
+        after = None
+        if span and page_index > 0:
+            segment, offset = divmod(page_index - 1, span)
+            # Wave n holds the n-th page of every segment
+            sort_key = (preview, offset, segment, next(self._seq))
+            after = page_index - 1 if offset else None
+        else:
+            sort_key = (preview, page_index, next(self._seq))
+        width = len(kwargs.get("batch") or ()) or 1
+        return PageTask(
+            sort_key,
+            task_id,
+            page_id,
+            job_id,
+            priority,
+            fn,
+            kwargs,
+            Future(),
+            page_index,
+            after,
+            width,
+        )
+
+    def push(self, task: PageTask) -> None:
+        bisect.insort(self._jobs.setdefault(task.job_id, []), task)
+        self._last_served.setdefault(task.job_id, 0)
+        self.pending[task.page_id] = task
+        self._track(task, 1)
+
+    def _track(self, task: PageTask, delta: int) -> None:
+        counts = self._outstanding.setdefault(task.job_id, {})
+        for index in range(task.page_index, task.page_index + task.width):
+            left = counts.get(index, 0) + delta
+            if left > 0:
+                counts[index] = left
+            else:
+                counts.pop(index, None)
+        if not counts:
+            del self._outstanding[task.job_id]
+
+    def release(self, task: PageTask) -> None:
+        """Forget a popped task once it has finished, unblocking the next page of its segment."""
+        self._track(task, -1)
+
+    def _ready(self, task: PageTask) -> bool:
+        return task.after is None or task.after not in self._outstanding.get(task.job_id, ())
+
+    def _first_ready(self, tasks: List[PageTask], check_ready: bool) -> Optional[int]:
+        if not check_ready:
+            return 0 if tasks else None
+        for i, task in enumerate(tasks):
+            if self._ready(task):
+                return i
+        return None
+
+    def _pick(
+        self,
+        jobs: Dict[str, List[PageTask]],
+        last_served: Dict[str, int],
+        eligible: Optional[Callable[[str], bool]] = None,
+        check_ready: bool = True,
+    ) -> Optional[Tuple[str, int]]:
+        best = None
+        best_key = None
+        for job_id, tasks in jobs.items():
+            if not tasks or (eligible is not None and not eligible(job_id)):
+                continue
+            i = self._first_ready(tasks, check_ready)
+            if i is None:
+                continue
+            head = tasks[i]
+            key = (-head.priority, 0 if head.is_preview else 1, last_served.get(job_id, 0))
+            if best_key is None or key < best_key:
+                best, best_key = (job_id, i), key
+        return best
+
+    def active_jobs(self) -> List[str]:
+        return list(self._jobs)
+
+    def pop(self, eligible: Optional[Callable[[str], bool]] = None) -> Optional[PageTask]:
+        """Next task from a job that ``eligible`` accepts (e.g. below its concurrency limit)."""
+        picked = self._pick(self._jobs, self._last_served, eligible)
+        if picked is None:
+            return None
+        job_id, i = picked
+        task = self._jobs[job_id].pop(i)
+        if not self._jobs[job_id]:
+            del self._jobs[job_id]
+            self._last_served.pop(job_id, None)
+        else:
+            self._last_served[job_id] = next(self._turn)
+        self.pending.pop(task.page_id, None)
+        return task
+
+    def positions(self) -> Dict[str, int]:
+        """Replay the pick order on a copy; position 1 runs next.
+
+        Wave dependencies are ignored here, so positions are an estimate for wave jobs.
+        """
+        jobs = {job_id: list(tasks) for job_id, tasks in self._jobs.items()}
+        last_served = dict(self._last_served)
+        turn = max(last_served.values(), default=0)
+        order: Dict[str, int] = {}
+        while True:
+            picked = self._pick(jobs, last_served, check_ready=False)
+            if picked is None:
+                return order
+            job_id, i = picked
+            task = jobs[job_id].pop(i)
+            order[task.page_id] = len(order) + 1
+            turn += 1
+            last_served[job_id] = turn
+
+
+class FairQueue:
+    """Worker pool for page tasks backed by the tasks table.
+
+    Every task is written to the database before it runs and is claimed with a
+    lease, so work survives restarts. The mode is set by ``start``:
+
+    - ``memory``: tasks enqueued in this process are ordered by a FairScheduler
+      (single-process deployments).
+    - ``db``: workers claim the next row straight from the tasks table, using
+      ``SKIP LOCKED`` on PostgreSQL, so several worker processes can share one queue.
+    - not started: this process only produces tasks (API with external workers).
+
+    With ``worker_runtime=asyncio`` the workers are coroutines on the shared event
+    loop instead of threads and run the ``*_async`` variant of each task function.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency_key: str,
+        context_key: Optional[str] = None,
+        batch_key: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        # Config key for the global pool size, which a job may override with its own limit
+        self.concurrency_key = concurrency_key
+        # Config key selecting wave scheduling ("waves") for pages that read their neighbours
+        self.context_key = context_key
+        # Config key for pages per task, so wave segments line up with batches
+        self.batch_key = batch_key
+        self.mode: Optional[str] = None
+        self.runtime = "threads"
+        self._async_event: Optional[asyncio.Event] = None
+        self.scheduler = FairScheduler(settings.preview_pages)
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.running: Dict[str, PageTask] = {}
+        self.running_by_job: Dict[str, int] = {}
+        # Per-job overrides (None = follow base_workers); a key means the policy is loaded
+        self.job_limits: Dict[str, Optional[int]] = {}
+        self.base_workers = 1
+        self._target = 0
+        self._alive = 0
+        self._thread_seq = itertools.count()
+
+    def start(self, mode: str, max_workers: int) -> None:
+        with self._cond:
+            if self.mode is not None:
+                return
+            self.mode = mode
+            self.runtime = settings.worker_runtime
+        self.resize(max_workers)
+
+    def resize(self, base_workers: int) -> None:
+        """Change the default pool size at runtime; threads are added or retired as needed."""
+        with self._cond:
+            self.base_workers = max(1, int(base_workers) if base_workers else 1)
+            self._rebalance()
+
+    def _rebalance(self) -> None:
+        # Caller holds the lock. In memory mode the pool grows so every active job can
+        # reach its own limit (a 20-wide job is not capped by a 4-wide default).
+        if self.mode is None:
+            return
+        target = self.base_workers
+        if self.mode == "memory":
+            running = {j for j, n in self.running_by_job.items() if n}
+            active = set(self.scheduler.active_jobs()) | running
+            wanted = sum(self._limit(job_id) for job_id in active)
+            target = max(target, min(wanted, settings.max_pool_workers))
+        self._target = target
+        while self._alive < self._target:
+            self._alive += 1
+            if self.runtime == "asyncio":
+                async_runtime.submit(self._async_worker())
+            else:
+                threading.Thread(
+                    target=self._worker,
+                    name=f"queue-{self.name}-{next(self._thread_seq)}",
+                    daemon=True,
+                ).start()
+        self._notify()
+
+    def _notify(self) -> None:
+        # Caller holds the lock
+        self._cond.notify_all()
+        if self.runtime == "asyncio":
+            async_runtime.call_soon(self._wake_async)
+
+    def _wake_async(self) -> None:
+        if self._async_event is not None:
+            self._async_event.set()
+
+    def _limit(self, job_id: str) -> int:
+        return self.job_limits.get(job_id) or self.base_workers
+
+    def _eligible(self, job_id: str) -> bool:
+        return self.running_by_job.get(job_id, 0) < self._limit(job_id)
+
+    def _job_override(self, job: Optional[Job]) -> Optional[int]:
+        value = (job.config or {}).get(self.concurrency_key) if job else None
+        try:
+            return max(1, int(value)) if value else None
+        except (TypeError, ValueError):
+            return None
+
+    def _job_limit(self, job: Optional[Job]) -> int:
+        return self._job_override(job) or self.base_workers
+
+    def _load_job_limit(self, db, job_id: str) -> int:
+        return self._job_limit(db.query(Job).filter(Job.id == job_id).first())
+
+    def _wave_span(self, db, job: Optional[Job], limit: int) -> Optional[int]:
+        """Pages per wave segment, or None when the job runs pages in plain page order.
+
+        One segment per in-flight slot keeps the job saturated while every page
+        after a segment head starts with its previous page already done.
+        """
+        if not self.context_key or job is None:
+            return None
+        mode = (job.config or {}).get(self.context_key) or getattr(settings, self.context_key)
+        if mode != "waves":
+            return None
+        total = (
+            job.total_pages or db.query(func.count(Page.id)).filter(Page.job_id == job.id).scalar()
+        )
+        span = max(1, math.ceil((total or 0) / limit))
+        batch = self.batch_size(job.config or {})
+        return math.ceil(span / batch) * batch
+
+    def batch_size(self, cfg: dict) -> int:
+        """Pages a producer should put in one task for a job with config ``cfg``."""
+        if not self.batch_key:
+            return 1
+        try:
+            return max(1, int(cfg.get(self.batch_key) or getattr(settings, self.batch_key)))
+        except (TypeError, ValueError):
+            return 1
+
+    def _load_job_policy(self, db, job_id: str, limit: Optional[int] = None) -> None:
+        # Caller does not hold the lock
+        job = db.query(Job).filter(Job.id == job_id).first()
+        limit = max(1, int(limit)) if limit is not None else self._job_override(job)
+        span = self._wave_span(db, job, limit or self.base_workers)
+        with self._cond:
+            self.job_limits[job_id] = limit
+            if span:
+                self.scheduler.spans[job_id] = span
+            else:
+                self.scheduler.spans.pop(job_id, None)
+
+    def set_job_limit(self, job_id: str, limit: Optional[int] = None) -> None:
+        """Set (or reload from Job.config when ``limit`` is None) a job's in-flight limit."""
+        db = SessionLocal()
+        try:
+            self._load_job_policy(db, job_id, limit)
+        finally:
+            db.close()
+        with self._cond:
+            self._rebalance()
+
+    def enqueue_page(
+        self,
+        fn: str | Callable[..., Any],
+        page_id: str,
+        job_id: str,
+        priority: int = 0,
+        page_index: int = 0,
+        **kwargs,
+    ) -> Optional[Future]:
+        """Queue one page task; a page that already has a queued or running task is left alone.
+
+        Returns the scheduled future in memory mode: the new task's, or the pending
+        one's when the page was already waiting here. None otherwise.
+        """
+        resolved = _resolve_callable(fn)
+        with self._cond:
+            existing = self.scheduler.pending.get(page_id)
+            if existing is not None:
+                return existing.future
+        queued = self._insert_tasks(fn, [(page_id, job_id, priority, page_index, kwargs)])
+        return self._dispatch(resolved, queued).get(page_id)
+
+    def enqueue_pages(self, fn: str | Callable[..., Any], pages: List[tuple], **kwargs) -> int:
+        """Queue (page_id, job_id, priority, page_index[, extra kwargs]) entries with one commit.
+
+        Pages that already have a queued or running task are skipped, as in
+        ``enqueue_page``. Returns how many tasks were queued.
+        """
+        resolved = _resolve_callable(fn)
+        entries = [
+            (*entry[:4], {**kwargs, **(entry[4] if len(entry) > 4 else {})}) for entry in pages
+        ]
+        queued = self._insert_tasks(fn, entries)
+        self._dispatch(resolved, queued)
+        return len(queued)
+
+    def _insert_tasks(self, fn, entries: List[tuple]) -> List[tuple]:
+        """Insert task rows for entries whose pages have no active task, in one transaction.
+
+        The active check and the insert share the write lock, so two producers
+        cannot both queue the same page and no row is written for a skipped one.
+        """
+        if not entries:
+            return []
+        db = SessionLocal()
+        try:
+            begin_write(db)
+            active = self._active_pages(db, {entry[1] for entry in entries})
+            rows = []
+            for page_id, job_id, priority, page_index, row_kwargs in entries:
+                covered = {page_id, *(row_kwargs.get("batch") or ())}
+                if covered & active:
+                    continue
+                active |= covered
+                rows.append(self._task_row(fn, page_id, job_id, priority, page_index, row_kwargs))
+            if not rows:
+                db.rollback()
+                return []
+            db.add_all(rows)
+            db.commit()
+            return [
+                (r.id, r.page_id, r.job_id, r.priority, r.page_index, dict(r.kwargs or {}))
+                for r in rows
+            ]
+        finally:
+            db.close()
+
+    def _dispatch(self, fn: Callable[..., Any], queued: List[tuple]) -> Dict[str, Future]:
+        if not queued:
+            return {}
+        if self.mode != "memory":
+            with self._cond:
+                self._notify()
+            return {}
+        for job_id in {entry[2] for entry in queued}:
+            if job_id not in self.job_limits:
+                self.set_job_limit(job_id)
+        return {entry[1]: self._schedule(entry[0], fn, *entry[1:]) for entry in queued}
+
+    def _task_row(self, fn, page_id, job_id, priority, page_index, kwargs) -> Task:
+        return Task(
+            queue=self.name,
+            fn=_callable_path(fn),
+            page_id=page_id,
+            job_id=job_id,
+            priority=priority or 0,
+            page_index=page_index or 0,
+            kwargs=kwargs,
+            status="queued",
+            max_attempts=settings.task_max_attempts,
+        )
+
+    def _schedule(self, task_id, fn, page_id, job_id, priority, page_index, kwargs) -> Future:
+        task = self.scheduler.make_task(
+            task_id, fn, page_id, job_id, priority or 0, page_index or 0, kwargs
+        )
+        with self._cond:
+            existing = self.scheduler.pending.get(page_id)
+            if existing is None:
+                self.scheduler.push(task)
+                self._rebalance()
+                return task.future
+        if existing.task_id != task_id:
+            # The page is already waiting on another row; this one would never be claimed
+            self._discard(task_id)
+        return existing.future
+
+    def _discard(self, task_id: str) -> None:
+        db = SessionLocal()
+        try:
+            db.query(Task).filter(Task.id == task_id, Task.status == "queued").delete(
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def load_queued(self) -> int:
+        """Schedule queued rows that are not in memory yet (after a restart or a reclaim)."""
+        if self.mode != "memory":
+            return 0
+        db = SessionLocal()
+        try:
+            rows = db.query(Task).filter(Task.queue == self.name, Task.status == "queued").all()
+            loaded = 0
+            for row in rows:
+                if row.page_id in self.scheduler.pending or row.page_id in self.running:
+                    continue
+                if row.job_id not in self.job_limits:
+                    self._load_job_policy(db, row.job_id)
+                try:
+                    fn = _resolve_callable(row.fn)
+                except Exception as e:
+                    row.status = "failed"
+                    row.error = str(e)
+                    continue
+                self._schedule(
+                    row.id,
+                    fn,
+                    row.page_id,
+                    row.job_id,
+                    row.priority,
+                    row.page_index,
+                    row.kwargs or {},
+                )
+                loaded += 1
+            db.commit()
+            return loaded
+        finally:
+            db.close()
+
+    def _db_order(self):
+        # Same policy as FairScheduler, expressed in SQL: ordering by page_index
+        # interleaves active jobs page by page.
+        return (
+            Task.priority.desc(),
+            case((Task.page_index <= settings.preview_pages, 0), else_=1),
+            Task.page_index,
+            Task.created_at,
+        )
+
+    def position(self, page_id: str) -> Optional[int]:
+        return self.positions().get(page_id)
+
+    def positions(self) -> Dict[str, int]:
+        if self.mode == "memory":
+            with self._cond:
+                return self.scheduler.positions()
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Task.page_id)
+                .filter(Task.queue == self.name, Task.status == "queued")
+                .order_by(*self._db_order())
+                .all()
+            )
+            order: Dict[str, int] = {}
+            for (page_id,) in rows:
+                order.setdefault(page_id, len(order) + 1)
+            return order
+        finally:
+            db.close()
+
+    def active_page_ids(self, job_id: str, db=None) -> set[str]:
+        """Pages of ``job_id`` with a queued or running task here, batch members included.
+
+        Read from the task table, so it also covers tasks held by external workers.
+        Pass ``db`` to read inside a caller's write transaction.
+        """
+        if db is not None:
+            return self._active_pages(db, {job_id})
+        db = SessionLocal()
+        try:
+            return self._active_pages(db, {job_id})
+        finally:
+            db.close()
+
+    def _active_pages(self, db, job_ids) -> set[str]:
+        rows = db.query(Task.page_id, Task.kwargs).filter(
+            Task.queue == self.name,
+            Task.job_id.in_(list(job_ids)),
+            Task.status.in_(("queued", "running")),
+        )
+        active = set()
+        for page_id, kwargs in rows:
+            active.add(page_id)
+            active.update((kwargs or {}).get("batch") or ())
+        return active
+
+    def running_page_ids(self) -> set[str]:
+        if self.mode == "memory":
+            with self._cond:
+                return set(self.running)
+        db = SessionLocal()
+        try:
+            rows = db.query(Task.page_id).filter(Task.queue == self.name, Task.status == "running")
+            return {page_id for (page_id,) in rows}
+        finally:
+            db.close()
+
+    def _lease_values(self) -> dict:
+        return {
+            Task.status: "running",
+            Task.lease_owner: WORKER_ID,
+            Task.lease_expires_at: _lease_expiry(),
+            Task.attempts: Task.attempts + 1,
+        }
+
+    def _claim(self, task_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            claimed = (
+                db.query(Task)
+                .filter(Task.id == task_id, Task.status == "queued")
+                .update(self._lease_values(), synchronize_session=False)
+            )
+            db.commit()
+            return claimed == 1
+        finally:
+            db.close()
+
+    def _claim_next(self) -> Optional[PageTask]:
+        db = SessionLocal()
+        try:
+            skip_locked = db.get_bind().dialect.name == "postgresql"
+            # Per-job limits are shared by every worker process, so count from the table
+            running = (
+                db.query(Task.job_id, func.count(Task.id))
+                .filter(Task.queue == self.name, Task.status == "running")
+                .group_by(Task.job_id)
+                .all()
+            )
+            saturated = [job_id for job_id, n in running if n >= self._load_job_limit(db, job_id)]
+            query = (
+                db.query(Task)
+                .filter(Task.queue == self.name, Task.status == "queued")
+                .order_by(*self._db_order())
+            )
+            if saturated:
+                query = query.filter(Task.job_id.notin_(saturated))
+            if skip_locked:
+                query = query.with_for_update(skip_locked=True)
+            for row in query.limit(1 if skip_locked else 8).all():
+                # Without row locks the conditional update is the claim; losers try the next row
+                claimed = (
+                    db.query(Task)
+                    .filter(Task.id == row.id, Task.status == "queued")
+                    .update(self._lease_values(), synchronize_session=False)
+                )
+                db.commit()
+                if claimed != 1:
+                    continue
+                try:
+                    fn = _resolve_callable(row.fn)
+                except Exception as e:
+                    self._finish(row.id, str(e))
+                    continue
+                return self.scheduler.make_task(
+                    row.id,
+                    fn,
+                    row.page_id,
+                    row.job_id,
+                    row.priority,
+                    row.page_index,
+                    row.kwargs or {},
+                )
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def _finish(self, task_id: str, error: str = "") -> None:
+        db = SessionLocal()
+        try:
+            db.query(Task).filter(Task.id == task_id, Task.lease_owner == WORKER_ID).update(
+                {
+                    Task.status: "failed" if error else "done",
+                    Task.error: error,
+                    Task.lease_expires_at: None,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _next_task(self) -> Optional[PageTask]:
+        if self.mode == "memory":
+            while True:
+                with self._cond:
+                    while True:
+                        if self._stopped or self._retire():
+                            return None
+                        task = self.scheduler.pop(self._eligible)
+                        if task is not None:
+                            break
+                        self._cond.wait()
+                    self._mark_running(task)
+                if self._claim(task.task_id):
+                    return task
+                # Claimed elsewhere or cancelled in the meantime
+                with self._cond:
+                    self._mark_done(task)
+                task.future.cancel()
+
+        while True:
+            with self._cond:
+                if self._stopped or self._retire():
+                    return None
+            try:
+                task = self._claim_next()
+            except Exception:
+                logger.exception("queue %s: claim failed", self.name)
+                task = None
+            if task is not None:
+                with self._cond:
+                    self._mark_running(task)
+                return task
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(timeout=settings.worker_poll_seconds)
+
+    def _retire(self) -> bool:
+        # Caller holds the lock; surplus threads exit after a shrink
+        if self._alive > self._target:
+            self._alive -= 1
+            return True
+        return False
+
+    def _mark_running(self, task: PageTask) -> None:
+        self.running[task.page_id] = task
+        self.running_by_job[task.job_id] = self.running_by_job.get(task.job_id, 0) + 1
+
+    def _mark_done(self, task: PageTask) -> None:
+        self.running.pop(task.page_id, None)
+        self.scheduler.release(task)
+        left = self.running_by_job.get(task.job_id, 0) - 1
+        if left > 0:
+            self.running_by_job[task.job_id] = left
+        else:
+            self.running_by_job.pop(task.job_id, None)
+        self._rebalance()
+
+    def _worker(self) -> None:
+        while True:
+            try:
+                task = self._next_task()
+            except Exception:
+                logger.exception("queue %s: scheduling failed", self.name)
+                continue
+            if task is None:
+                return
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        task.future.set_result(task.fn(task.page_id, **task.kwargs))
+                        self._finish(task.task_id)
+                    except BaseException as e:
+                        task.future.set_exception(e)
+                        self._finish(task.task_id, str(e))
+            except Exception:
+                logger.exception("queue %s: task %s bookkeeping failed", self.name, task.task_id)
+            finally:
+                with self._cond:
+                    self._mark_done(task)
+
+    async def _next_task_async(self) -> Optional[PageTask]:
+        if self._async_event is None:
+            self._async_event = asyncio.Event()
+        event = self._async_event
+        while True:
+            # Clear before checking so a wakeup between check and wait is not lost
+            event.clear()
+            task = None
+            with self._cond:
+                if self._stopped or self._retire():
+                    return None
+                if self.mode == "memory":
+                    task = self.scheduler.pop(self._eligible)
+                    if task is not None:
+                        self._mark_running(task)
+
+            if self.mode == "memory":
+                if task is None:
+                    await event.wait()
+                    continue
+                if await async_runtime.run_blocking(self._claim, task.task_id):
+                    return task
+                with self._cond:
+                    self._mark_done(task)
+                task.future.cancel()
+                continue
+
+            try:
+                task = await async_runtime.run_blocking(self._claim_next)
+            except Exception:
+                logger.exception("queue %s: claim failed", self.name)
+            if task is not None:
+                with self._cond:
+                    self._mark_running(task)
+                return task
+            try:
+                await asyncio.wait_for(event.wait(), timeout=settings.worker_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _async_worker(self) -> None:
+        while True:
+            try:
+                task = await self._next_task_async()
+            except Exception:
+                logger.exception("queue %s: scheduling failed", self.name)
+                await asyncio.sleep(1)
+                continue
+            if task is None:
+                return
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        async_fn = _async_variant(task.fn)
+                        if async_fn is not None:
+                            result = await async_fn(task.page_id, **task.kwargs)
+                        else:
+                            result = await async_runtime.run_blocking(
+                                functools.partial(task.fn, task.page_id, **task.kwargs)
+                            )
+                        task.future.set_result(result)
+                        await async_runtime.run_blocking(self._finish, task.task_id)
+                    except Exception as e:
+                        task.future.set_exception(e)
+                        await async_runtime.run_blocking(self._finish, task.task_id, str(e))
+            except Exception:
+                logger.exception("queue %s: task %s bookkeeping failed", self.name, task.task_id)
+            finally:
+                with self._cond:
+                    self._mark_done(task)
+
+    def running_task_ids(self) -> List[str]:
+        with self._cond:
+            return [t.task_id for t in self.running.values()]
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._notify()
+
+
+queue_stage_a = FairQueue(
+    settings.queue_stage_a, "stage_a_concurrency", "stage_a_context_mode", "stage_a_batch_size"
+)
+queue_stage_b = FairQueue(settings.queue_stage_b, "stage_b_concurrency")
 queue_qa = SimpleQueue(settings.queue_qa, 1)
+queue_import = SimpleQueue(settings.queue_import, 1)
+
+
+_page_queues = (queue_stage_a, queue_stage_b)
+_lease_stop = threading.Event()
+_lease_thread: Optional[threading.Thread] = None
+
+
+def _renew_leases() -> None:
+    task_ids = [tid for q in _page_queues for tid in q.running_task_ids()]
+    if not task_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.query(Task).filter(Task.id.in_(task_ids), Task.lease_owner == WORKER_ID).update(
+            {Task.lease_expires_at: _lease_expiry()},
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def reclaim_expired_tasks() -> int:
+    """Requeue running tasks whose lease ran out; give up after max_attempts."""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Task)
+            .filter(Task.status == "running", Task.lease_expires_at < datetime.utcnow())
+            .all()
+        )
+        for row in rows:
+            row.lease_owner = ""
+            row.lease_expires_at = None
+            if row.attempts >= row.max_attempts:
+                row.status = "failed"
+                row.error = f"Abandoned after {row.attempts} attempts"
+                # A batched task carries its other pages in kwargs; none of them will run
+                page_ids = {row.page_id, *((row.kwargs or {}).get("batch") or ())}
+                for page in db.query(Page).filter(Page.id.in_(page_ids)).all():
+                    page.status = "failed"
+                    page.error = row.error
+            else:
+                row.status = "queued"
+        db.commit()
+        return len(rows)
+    finally:
+        db.close()
+
+
+def prune_finished_tasks() -> int:
+    """Delete done/failed task rows older than ``task_retention_hours``."""
+    if settings.task_retention_hours <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(hours=settings.task_retention_hours)
+    db = SessionLocal()
+    try:
+        deleted = (
+            db.query(Task)
+            .filter(Task.status.in_(("done", "failed")), Task.updated_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+_pool_sizes_pinned = False
+
+
+def sync_pool_sizes(cfg: Optional[dict] = None) -> None:
+    """Resize the Stage A/B pools to the global settings (read from the DB when ``cfg`` is None)."""
+    if _pool_sizes_pinned:
+        return
+    if cfg is None:
+        from .settings_store import get_global_settings
+
+        db = SessionLocal()
+        try:
+            cfg = dict(get_global_settings(db).config or {})
+        finally:
+            db.close()
+    for q in _page_queues:
+        if q.mode is not None:
+            q.resize(cfg.get(q.concurrency_key) or getattr(settings, q.concurrency_key))
+
+
+def pin_pool_sizes() -> None:
+    global _pool_sizes_pinned
+    _pool_sizes_pinned = True
+
+
+def _lease_loop() -> None:
+    interval = max(1.0, settings.task_lease_seconds / 3)
+    while not _lease_stop.wait(interval):
+        try:
+            # Picks up /api/settings changes made by other processes
+            sync_pool_sizes()
+            _renew_leases()
+            if reclaim_expired_tasks():
+                for q in _page_queues:
+                    q.load_queued()
+            prune_finished_tasks()
+        except Exception:
+            logger.exception("task lease maintenance failed")
+
+
+def start_queues(stages: str = "ab", mode: str = "memory") -> None:
+    """Start page workers, recover durable tasks and start lease upkeep.
+
+    The API calls this at startup unless ``worker_mode`` is ``external``;
+    ``python -m app.worker`` calls it with ``mode="db"``.
+    """
+    global _lease_thread
+    if "a" in stages:
+        queue_stage_a.start(mode, settings.stage_a_concurrency)
+    if "b" in stages:
+        queue_stage_b.start(mode, settings.stage_b_concurrency)
+    sync_pool_sizes()
+    reclaim_expired_tasks()
+    prune_finished_tasks()
+    for q in _page_queues:
+        q.load_queued()
+    if _lease_thread is None:
+        _lease_stop.clear()
+        _lease_thread = threading.Thread(target=_lease_loop, name="queue-leases", daemon=True)
+        _lease_thread.start()
 
 
 def shutdown_queues() -> None:
-    for q in (queue_stage_a, queue_stage_b, queue_qa):
+    from .llm_gateway import close_clients
+
+    _lease_stop.set()
+    for q in (queue_stage_a, queue_stage_b, queue_qa, queue_import):
         q.shutdown()
+    async_runtime.shutdown_runtime()
+    close_clients()
+    page_writer.flush()
@@ -0,0 +1,212 @@
+"""Page regions for partial Stage B renders.
+
+A region is an ``(x0, y0, x1, y1)`` box in normalized page coordinates, the same
+space as ``bbox_norm``, so one box addresses the original image and a rendered
+output even when the model returned the page at a different resolution.
+"""
+import io
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageDraw
+
+Box = Tuple[float, float, float, float]
+
+
+def item_box(item: dict) -> Optional[Box]:
+    bbox = item.get("bbox_norm")
+    if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        return None
+    try:
+        x0, y0, x1, y1 = (min(1.0, max(0.0, float(v))) for v in bbox)
+    except (TypeError, ValueError):
+        return None
+    x0, x1 = sorted((x0, x1))
+    y0, y1 = sorted((y0, y1))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0, y0, x1, y1)
+
+
+def area(box: Box) -> float:
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def overlaps(a: Box, b: Box) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def union(a: Box, b: Box) -> Box:
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def pad(box: Box, dx: float, dy: float) -> Box:
+    return (
+        max(0.0, box[0] - dx),
+        max(0.0, box[1] - dy),
+        min(1.0, box[2] + dx),
+        min(1.0, box[3] + dy),
+    )
+
+
+def merge_boxes(boxes: Sequence[Box]) -> List[Box]:
+    """Union overlapping boxes until none overlap."""
+    merged: List[Box] = []
+    for box in boxes:
+        while True:
+            hit = next((i for i, other in enumerate(merged) if overlaps(box, other)), None)
+            if hit is None:
+                break
+            box = union(box, merged.pop(hit))
+        merged.append(box)
+    return sorted(merged)
+
+
+def plan_regions(seeds: Sequence[Box], items: Sequence[dict], dx: float, dy: float) -> List[Box]:
+    """Padded, merged regions around ``seeds`` that also fully contain every item they touch.
+
+    An item is never cut by a region edge, so each crop carries whole bubbles.
+    """
+    boxes = merge_boxes([pad(b, dx, dy) for b in seeds])
+    item_boxes = [pad(b, dx, dy) for b in (item_box(i) for i in items) if b]
+    while True:
+        grown = []
+        for box in boxes:
+            for other in item_boxes:
+                if overlaps(box, other):
+                    box = union(box, other)
+            grown.append(box)
+        grown = merge_boxes(grown)
+        if grown == boxes:
+            return boxes
+        boxes = grown
+
+
+def group_tiles(clusters: Sequence[Box], max_w: float, max_h: float) -> List[Box]:
+    """Combine neighbouring clusters into tiles no larger than ``max_w`` x ``max_h``.
+
+    Clusters are taken in reading-grid order and joined while the union stays
+    within the size limit and does not run into another tile. A cluster that is
+    already larger than the limit stays a tile of its own.
+    """
+    tiles: List[Box] = []
+    for cluster in sorted(clusters, key=lambda b: (b[1], b[0])):
+        for i, tile in enumerate(tiles):
+            joined = union(tile, cluster)
+            if joined[2] - joined[0] > max_w or joined[3] - joined[1] > max_h:
+                continue
+            if any(overlaps(joined, other) for j, other in enumerate(tiles) if j != i):
+                continue
+            if any(overlaps(joined, c) and not overlaps(tile, c) for c in clusters if c != cluster):
+                continue
+            tiles[i] = joined
+            break
+        else:
+            tiles.append(cluster)
+    return merge_boxes(tiles)
+
+
+def _item_key(item: dict, index: int) -> str:
+    return str(item.get("id")) if item.get("id") is not None else f"#{index}"
+
+
+def _without_items(doc: dict) -> dict:
+    return {k: v for k, v in doc.items() if k != "items"}
+
+
+def changed_seeds(old: dict, new: dict) -> Optional[List[Box]]:
+    """Boxes touched by item edits between two page JSONs, or None when a full render is needed.
+
+    Changed items contribute their old and new bbox, added items the new one and
+    removed items the old one, so stale lettering is always redrawn.
+    """
+    if _without_items(old) != _without_items(new):
+        return None
+    before = {_item_key(item, i): item for i, item in enumerate(old.get("items") or [])}
+    after = {_item_key(item, i): item for i, item in enumerate(new.get("items") or [])}
+    seeds: List[Box] = []
+    for key in before.keys() | after.keys():
+        a, b = before.get(key), after.get(key)
+        if a == b:
+            continue
+        for item in (a, b):
+            if item is None:
+                continue
+            box = item_box(item)
+            if box is None:
+                return None
+            seeds.append(box)
+    return seeds
+
+
+def items_within(box: Box, items: Sequence[dict]) -> List[dict]:
+    """Items inside ``box`` with ``bbox_norm`` re-expressed relative to the box."""
+    width, height = box[2] - box[0], box[3] - box[1]
+    inside = []
+    for item in items:
+        ib = item_box(item)
+        if ib is None or not overlaps(box, ib):
+            continue
+        local = [
+            round((max(ib[0], box[0]) - box[0]) / width, 6),
+            round((max(ib[1], box[1]) - box[1]) / height, 6),
+            round((min(ib[2], box[2]) - box[0]) / width, 6),
+            round((min(ib[3], box[3]) - box[1]) / height, 6),
+        ]
+        inside.append({**item, "bbox_norm": local})
+    return inside
+
+
+def pixel_box(box: Box, size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    w, h = size
+    x0, y0 = int(box[0] * w), int(box[1] * h)
+    x1, y1 = max(x0 + 1, round(box[2] * w)), max(y0 + 1, round(box[3] * h))
+    return (x0, y0, min(w, x1), min(h, y1))
+
+
+def crop(img: Image.Image, box: Box) -> Image.Image:
+    return img.crop(pixel_box(box, img.size))
+
+
+def encode_png(img: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def decode(data: bytes, mode: str) -> Image.Image:
+    with Image.open(io.BytesIO(data)) as img:
+        return img.convert(mode)
+
+
+def feather_mask(size: Tuple[int, int], feather: int, edges: Dict[str, bool]) -> Image.Image:
+    """Opaque mask that ramps to transparent over ``feather`` px on the sides set in ``edges``."""
+    w, h = size
+    feather = max(0, min(feather, w // 2, h // 2))
+    mask = Image.new("L", size, 255)
+    if not feather or not any(edges.values()):
+        return mask
+    mask = Image.new("L", size, 0)
+    draw = ImageDraw.Draw(mask)
+    for i in range(feather + 1):
+        inset = {side: (i if fade else 0) for side, fade in edges.items()}
+        value = round(255 * (i + 1) / (feather + 1))
+        draw.rectangle(
+            (inset["left"], inset["top"], w - 1 - inset["right"], h - 1 - inset["bottom"]),
+            fill=value,
+        )
+    return mask
+
+
+def composite(base: Image.Image, patch: Image.Image, box: Box, feather: int) -> None:
+    """Paste ``patch`` over ``box`` of ``base`` in place, blending interior edges.
+
+    Edges on the page border are not faded, since there is nothing to blend with.
+    """
+    x0, y0, x1, y1 = pixel_box(box, base.size)
+    size = (x1 - x0, y1 - y0)
+    if patch.size != size:
+        patch = patch.resize(size, Image.Resampling.LANCZOS)
+    if patch.mode != base.mode:
+        patch = patch.convert(base.mode)
+    edges = {"left": x0 > 0, "top": y0 > 0, "right": x1 < base.width, "bottom": y1 < base.height}
+    base.paste(patch, (x0, y0), feather_mask(size, feather, edges))
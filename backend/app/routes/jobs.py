@@ -1,19 +1,41 @@
-import io
+import asyncio
+import json
+import shutil
 import zipfile
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import String
 from sqlalchemy.orm import Session
-from natsort import natsorted
 
-from ..db import get_db
+from ..config import settings
+from ..db import SessionLocal, begin_write, get_db
+from ..events import bus, job_event
+from .. import listing, progress
 from ..models import Job, Page
-from ..schemas import JobCreate, JobOut, JobUpdate, PageOut
+from ..schemas import (
+    ItemList,
+    JsonBatchUpdate,
+    JobCreate,
+    JobOut,
+    JobStatus,
+    JobUpdate,
+    PageOut,
+    RequeueRequest,
+    RequeueResult,
+    ImportTaskOut,
+    JobConcurrencyUpdate,
+)
 from ..storage import ensure_job_dirs, page_original_path, page_json_path
-from ..queue import queue_stage_a
-from ..settings_store import get_global_settings, default_config
+from ..queue import queue_stage_a, queue_stage_b, queue_import
+from ..workers.importer import create_task, get_task
+from ..page_json import iter_job_json, load_json, merge_items, write_json_files
+from ..exporter import export_entries, export_signature, export_cache_path, stream_export
+from ..settings_store import get_global_settings, default_config, invalidate_config
 from ..secrets_vault import encrypt_secret, last4, SecretVaultError
 
 router = APIRouter(prefix="/api/jobs", tags=["jobs"])
@@ -31,41 +53,9 @@ def _create_page(db: Session, job: Job, page_index: int, img_path: str) -> Page:
     return page
 
 
-def _save_image_bytes(img_bytes: bytes, out_path: str) -> None:
-    Path(out_path).write_bytes(img_bytes)
-
-
-def _extract_zip_to_pages(db: Session, job: Job, zf: zipfile.ZipFile) -> int:
-    names = [n for n in zf.namelist() if n.lower().endswith((".png", ".jpg", ".jpeg", ".webp"))]
-    names = natsorted(names)
-    if not names:
-        raise HTTPException(status_code=400, detail="No images found in archive")
-
-    for idx, name in enumerate(names):
-        ext = name.split(".")[-1].lower()
-        img_path = page_original_path(job.id, idx + 1, ext)
-        _save_image_bytes(zf.read(name), img_path)
-        _create_page(db, job, idx + 1, img_path)
-
-    return len(names)
-
-
-def _extract_pdf_to_pages(db: Session, job: Job, data: bytes) -> int:
-    try:
-        from pdf2image import convert_from_bytes
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"pdf2image not available: {e}")
-
-    images = convert_from_bytes(data)
-    if not images:
-        raise HTTPException(status_code=400, detail="No pages rendered from PDF")
-
-    for idx, img in enumerate(images):
-        img_path = page_original_path(job.id, idx + 1, "png")
-        img.save(img_path, format="PNG")
-        _create_page(db, job, idx + 1, img_path)
-
-    return len(images)
+def _save_upload(upload: UploadFile, out_path: str) -> None:
+    with open(out_path, "wb") as f:
+        shutil.copyfileobj(upload.file, f, 1024 * 1024)
 
 
 def _merge_config(base: dict, override: dict | None) -> dict:
@@ -76,9 +66,52 @@ def _merge_config(base: dict, override: dict | None) -> dict:
     return merged
 
 
-@router.get("", response_model=List[JobOut])
-def list_jobs(db: Session = Depends(get_db)):
-    return db.query(Job).order_by(Job.created_at.desc()).all()
+def _inherit_concurrency(cfg: dict, global_cfg: dict) -> dict:
+    """Drop pool sizes that match the global value, so the job follows later global changes."""
+    for key in ("stage_a_concurrency", "stage_b_concurrency"):
+        if not cfg.get(key) or cfg[key] == global_cfg.get(key):
+            cfg.pop(key, None)
+    return cfg
+
+
+def _cursor_time(value) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("", response_model=ItemList)
+def list_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status: Optional[str] = None,
+    tag: Optional[str] = None,
+    priority: Optional[int] = None,
+    min_priority: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """Newest first. ``status`` takes a comma-separated list; ``tag`` matches one tag."""
+    names = listing.parse_fields(fields, JobOut.model_fields)
+    keys = [Job.created_at, Job.id]
+    columns = [getattr(Job, name) for name in names if name != "id"]
+    query = db.query(*keys, *columns)
+    statuses = listing.parse_list(status)
+    if statuses:
+        query = query.filter(Job.status.in_(statuses))
+    if tag:
+        pattern = listing.json_contains_like(tag)
+        query = query.filter(Job.tags.cast(String).like(pattern, escape="\\"))
+    if priority is not None:
+        query = query.filter(Job.priority == priority)
+    if min_priority is not None:
+        query = query.filter(Job.priority >= min_priority)
+    last = listing.decode_cursor(cursor, 2)
+    if last:
+        query = query.filter(listing.after(keys, [_cursor_time(last[0]), last[1]], descending=True))
+    rows = query.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1).all()
+    return listing.page_of(rows, names, limit, lambda row: (row.created_at.isoformat(), row.id))
 
 
 @router.post("", response_model=JobOut)
@@ -87,7 +120,7 @@ def create_job(payload: JobCreate, db: Session = Depends(get_db)):
     base_cfg = default_config()
     if global_settings.config:
         base_cfg.update(global_settings.config)
-    cfg = _merge_config(base_cfg, payload.config)
+    cfg = _inherit_concurrency(_merge_config(base_cfg, payload.config), base_cfg)
 
     job = Job(
         title=payload.title or "",
@@ -138,7 +171,9 @@ def update_job(job_id: str, payload: JobUpdate, db: Session = Depends(get_db)):
         if job.config:
             base_cfg.update(job.config)
         base_cfg.update(payload.config)
-        job.config = base_cfg
+        global_cfg = default_config()
+        global_cfg.update(get_global_settings(db).config or {})
+        job.config = _inherit_concurrency(base_cfg, global_cfg)
     if payload.api_key is not None:
         try:
             job.api_key_encrypted = encrypt_secret(payload.api_key)
@@ -148,10 +183,38 @@ def update_job(job_id: str, payload: JobUpdate, db: Session = Depends(get_db)):
 
     db.commit()
     db.refresh(job)
+    invalidate_config(job.id)
+    return job
+
+
+@router.put("/{job_id}/concurrency", response_model=JobOut)
+def update_job_concurrency(
+    job_id: str, payload: JobConcurrencyUpdate, db: Session = Depends(get_db)
+):
+    # Allowed on locked/running jobs: only throughput changes, not what gets produced
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    cfg = dict(job.config or {})
+    for key in ("stage_a_concurrency", "stage_b_concurrency"):
+        value = getattr(payload, key)
+        if value is None:
+            continue
+        if value < 1:
+            raise HTTPException(status_code=400, detail=f"{key} must be >= 1")
+        cfg[key] = value
+    job.config = cfg
+    db.commit()
+    db.refresh(job)
+    invalidate_config(job.id)
+    for key, q in (("stage_a_concurrency", queue_stage_a), ("stage_b_concurrency", queue_stage_b)):
+        if getattr(payload, key) is not None:
+            q.set_job_limit(job.id, cfg[key])
     return job
 
 
-@router.post("/{job_id}/import", response_model=JobOut)
+@router.post("/{job_id}/import", response_model=ImportTaskOut)
 def import_archive(job_id: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
@@ -159,23 +222,35 @@ def import_archive(job_id: str, file: UploadFile = File(...), db: Session = Depe
     if job.locked:
         raise HTTPException(status_code=409, detail="Job is locked")
 
-    ensure_job_dirs(job.id)
-    data = file.file.read()
-    filename = file.filename or ""
-
-    if filename.lower().endswith((".cbz", ".zip")):
-        with zipfile.ZipFile(io.BytesIO(data)) as zf:
-            count = _extract_zip_to_pages(db, job, zf)
-    elif filename.lower().endswith(".pdf"):
-        count = _extract_pdf_to_pages(db, job, data)
+    filename = (file.filename or "").lower()
+    if filename.endswith((".cbz", ".zip")):
+        kind = "zip"
+    elif filename.endswith(".pdf"):
+        kind = "pdf"
     else:
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
-    job.total_pages = count
-    job.status = "ready"
+    dirs = ensure_job_dirs(job.id)
+    task = create_task(job.id, kind)
+    spool_path = str(Path(dirs["intermediate"]) / f"import-{task['id']}.{kind}")
+    _save_upload(file, spool_path)
+
+    if kind == "zip" and not zipfile.is_zipfile(spool_path):
+        Path(spool_path).unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Invalid archive")
+
+    job.status = "importing"
     db.commit()
-    db.refresh(job)
-    return job
+    queue_import.enqueue("app.workers.importer.run_import", task["id"], job.id, spool_path)
+    return task
+
+
+@router.get("/{job_id}/imports/{task_id}", response_model=ImportTaskOut)
+def get_import(job_id: str, task_id: str):
+    task = get_task(task_id)
+    if not task or task["job_id"] != job_id:
+        raise HTTPException(status_code=404, detail="Import task not found")
+    return task
 
 
 @router.post("/{job_id}/pages", response_model=JobOut)
@@ -185,38 +260,59 @@ def upload_pages(job_id: str, files: List[UploadFile] = File(...), db: Session =
         raise HTTPException(status_code=404, detail="Job not found")
 
     ensure_job_dirs(job.id)
-    page_index = 1
-    existing = db.query(Page).filter(Page.job_id == job.id).count()
-    if existing:
-        page_index = existing + 1
+    existing = sum(progress.counts(db, job.id).values())
+    page_index = existing + 1
 
     for f in files:
         ext = (f.filename or "").split(".")[-1].lower() or "png"
         img_path = page_original_path(job.id, page_index, ext)
-        _save_image_bytes(f.file.read(), img_path)
+        _save_upload(f, img_path)
         _create_page(db, job, page_index, img_path)
         page_index += 1
 
-    job.total_pages = db.query(Page).filter(Page.job_id == job.id).count()
+    job.total_pages = page_index - 1
     job.status = "ready"
     db.commit()
     db.refresh(job)
     return job
 
 
+def _stage_a_batches(pages: List[Page], size: int) -> List[List[Page]]:
+    # Runs of consecutive pages, at most ``size`` long
+    groups: List[List[Page]] = []
+    for page in pages:
+        last = groups[-1] if groups else None
+        if last and len(last) < size and last[-1].page_index == page.page_index - 1:
+            last.append(page)
+        else:
+            groups.append([page])
+    return groups
+
+
+def _enqueue_stage_a(job: Job, pages: List[Page], **kwargs) -> int:
+    # Page count and config may have changed since the job last ran
+    queue_stage_a.set_job_limit(job.id)
+    entries = []
+    for group in _stage_a_batches(pages, queue_stage_a.batch_size(job.config or {})):
+        head = group[0]
+        extra = {"batch": [p.id for p in group]} if len(group) > 1 else {}
+        entries.append((head.id, job.id, job.priority, head.page_index, extra))
+    return queue_stage_a.enqueue_pages("app.workers.stage_a.run_stage_a", entries, **kwargs)
+
+
 @router.post("/{job_id}/run", response_model=JobOut)
 def run_job(job_id: str, db: Session = Depends(get_db)):
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    pages = db.query(Page).filter(Page.job_id == job.id).all()
+    pages = db.query(Page).filter(Page.job_id == job.id).order_by(Page.page_index).all()
     if not pages:
         raise HTTPException(status_code=400, detail="No pages to process")
 
-    for page in pages:
-        if page.status in ("queued", "failed"):
-            queue_stage_a.enqueue("app.workers.stage_a.run_stage_a", page.id)
+    in_flight = queue_stage_a.active_page_ids(job.id)
+    todo = [p for p in pages if p.status in ("queued", "failed") and p.id not in in_flight]
+    _enqueue_stage_a(job, todo)
 
     job.status = "running"
     job.locked = True
@@ -225,6 +321,76 @@ def run_job(job_id: str, db: Session = Depends(get_db)):
     return job
 
 
+def _in_flight(db: Session, job_id: str) -> set:
+    """Pages of a job with a queued or running Stage A or Stage B task."""
+    return set().union(*(q.active_page_ids(job_id, db) for q in (queue_stage_a, queue_stage_b)))
+
+
+@router.post("/{job_id}/requeue", response_model=RequeueResult)
+def requeue_pages(job_id: str, payload: RequeueRequest, db: Session = Depends(get_db)):
+    """Re-run the pages matching the filters, skipping pages whose work is already in flight."""
+    stage = payload.stage.upper() if payload.stage.lower() != "auto" else "auto"
+    if stage not in ("A", "B", "auto"):
+        raise HTTPException(status_code=400, detail="stage must be A, B or auto")
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if not payload.dry_run:
+        # No task can be queued for these pages between the in-flight check and the reset
+        begin_write(db)
+    query = db.query(Page).filter(Page.job_id == job.id)
+    if payload.statuses:
+        query = query.filter(Page.status.in_(payload.statuses))
+    if payload.error_contains:
+        pattern = listing.contains_like(payload.error_contains)
+        query = query.filter(Page.error.ilike(pattern, escape="\\"))
+    if payload.from_index is not None:
+        query = query.filter(Page.page_index >= payload.from_index)
+    if payload.to_index is not None:
+        query = query.filter(Page.page_index <= payload.to_index)
+    if payload.page_ids is not None:
+        query = query.filter(Page.id.in_(payload.page_ids))
+    pages = query.order_by(Page.page_index).all()
+
+    in_flight = _in_flight(db, job.id)
+    todo = [p for p in pages if p.id not in in_flight]
+    if stage == "auto":
+        stage_a = [p for p in todo if not (p.json_path and Path(p.json_path).is_file())]
+        stage_b = [p for p in todo if p not in stage_a]
+    else:
+        stage_a = todo if stage == "A" else []
+        stage_b = todo if stage == "B" else []
+    result = RequeueResult(
+        matched=len(pages),
+        in_flight=len(pages) - len(todo),
+        stage_a=[p.page_index for p in stage_a],
+        stage_b=[p.page_index for p in stage_b],
+    )
+    if payload.dry_run or not todo:
+        db.rollback()
+        return result
+
+    # Reset first so progress counts show the pages as waiting rather than failed
+    for page in stage_a:
+        page.status, page.error = "queued", ""
+    for page in stage_b:
+        page.status, page.error = "A_done", ""
+    # A job that was done goes back to running with its pages (app.progress)
+    db.commit()
+
+    queued = 0
+    if stage_a:
+        queued += _enqueue_stage_a(job, stage_a, use_cache=not payload.bypass_cache)
+    if stage_b:
+        queued += queue_stage_b.enqueue_pages(
+            "app.workers.stage_b.run_stage_b",
+            [(p.id, job.id, job.priority, p.page_index) for p in stage_b],
+        )
+    result.queued_tasks = queued
+    return result
+
+
 @router.post("/{job_id}/cover")
 def upload_cover(job_id: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -234,7 +400,7 @@ def upload_cover(job_id: str, file: UploadFile = File(...), db: Session = Depend
     ext = (file.filename or "").split(".")[-1].lower() or "png"
     base = Path(ensure_job_dirs(job.id)["base"])
     cover_path = base / f"cover.{ext}"
-    cover_path.write_bytes(file.file.read())
+    _save_upload(file, str(cover_path))
     job.cover_path = str(cover_path)
     db.commit()
     return {"ok": True}
@@ -256,26 +422,271 @@ def get_job(job_id: str, db: Session = Depends(get_db)):
     return job
 
 
-@router.get("/{job_id}/pages", response_model=List[PageOut])
-def list_pages(job_id: str, db: Session = Depends(get_db)):
-    return db.query(Page).filter(Page.job_id == job_id).order_by(Page.page_index).all()
+@router.get("/{job_id}/status", response_model=JobStatus)
+def get_job_status(job_id: str, db: Session = Depends(get_db)):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    counts = progress.counts(db, job.id)
+    total = job.total_pages or 0
+    return JobStatus(
+        id=job.id,
+        status=job.status,
+        total_pages=total,
+        done_pages=job.done_pages or 0,
+        pages_done_pct=round(100.0 * (job.done_pages or 0) / total, 1) if total else 0,
+        counts=counts,
+        stages=progress.stage_counts(counts),
+        blocked=counts.get("blocked", 0),
+        failed=counts.get("failed", 0),
+    )
+
+
+@router.get("/{job_id}/pages", response_model=ItemList)
+def list_pages(
+    job_id: str,
+    limit: int = Query(200, ge=1, le=2000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Pages in reading order, e.g. ``?fields=id,status,page_index&status=failed,blocked``."""
+    names = listing.parse_fields(fields, PageOut.model_fields)
+    keys = [Page.page_index, Page.id]
+    columns = [getattr(Page, name) for name in names if name not in ("page_index", "id")]
+    query = db.query(*keys, *columns).filter(Page.job_id == job_id)
+    statuses = listing.parse_list(status)
+    if statuses:
+        query = query.filter(Page.status.in_(statuses))
+    last = listing.decode_cursor(cursor, 2)
+    if last:
+        query = query.filter(listing.after(keys, last))
+    rows = query.order_by(Page.page_index, Page.id).limit(limit + 1).all()
+    return listing.page_of(rows, names, limit, lambda row: (row.page_index, row.id))
+
+
+@router.get("/{job_id}/json")
+def get_job_json(
+    job_id: str,
+    view: str = "pages",
+    status: Optional[str] = None,
+    from_index: Optional[int] = None,
+    to_index: Optional[int] = None,
+    needs_user_confirm: Optional[bool] = None,
+    item_type: Optional[str] = None,
+    max_confidence: Optional[float] = None,
+    db: Session = Depends(get_db),
+):
+    """Every page's JSON (``view=pages``) or matching items across pages (``view=items``)."""
+    if view not in ("pages", "items"):
+        raise HTTPException(status_code=400, detail="view must be pages or items")
+    if not db.query(Job.id).filter(Job.id == job_id).first():
+        raise HTTPException(status_code=404, detail="Job not found")
+    query = db.query(Page.id, Page.page_index, Page.status, Page.json_path).filter(
+        Page.job_id == job_id
+    )
+    statuses = listing.parse_list(status)
+    if statuses:
+        query = query.filter(Page.status.in_(statuses))
+    if from_index is not None:
+        query = query.filter(Page.page_index >= from_index)
+    if to_index is not None:
+        query = query.filter(Page.page_index <= to_index)
+    rows = [tuple(row) for row in query.order_by(Page.page_index)]
+    filters = {
+        "needs_user_confirm": needs_user_confirm,
+        "types": set(listing.parse_list(item_type)),
+        "max_confidence": max_confidence,
+    }
+    return StreamingResponse(
+        iter_job_json(job_id, rows, view, filters), media_type="application/json"
+    )
+
+
+@router.patch("/{job_id}/json")
+def update_job_json(job_id: str, payload: JsonBatchUpdate, db: Session = Depends(get_db)):
+    """Save edits to many pages at once and (by default) queue Stage B for all of them.
+
+    Pages with work in flight are refused with 409, since the running stage would
+    overwrite the edit or render the JSON it read before.
+    """
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Hold the write lock so no task starts on these pages before the edit is saved
+    begin_write(db)
+    ids = [edit.page_id for edit in payload.pages]
+    pages = {p.id: p for p in db.query(Page).filter(Page.job_id == job_id, Page.id.in_(ids))}
+    missing = [pid for pid in ids if pid not in pages]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Pages not found: {', '.join(missing)}")
+    in_flight = _in_flight(db, job.id)
+    busy = sorted(
+        p.page_index
+        for p in pages.values()
+        if p.id in in_flight or p.status in ("A_running", "B_running")
+    )
+    if busy:
+        raise HTTPException(
+            status_code=409, detail=f"Pages in progress: {', '.join(str(i) for i in busy)}"
+        )
+
+    docs = []
+    for edit in payload.pages:
+        page = pages[edit.page_id]
+        if not page.json_path:
+            raise HTTPException(status_code=409, detail=f"Page {page.page_index} has no JSON yet")
+        if edit.content is not None:
+            content = edit.content
+        elif edit.items is not None:
+            current = load_json(page.json_path)
+            if current is None:
+                raise HTTPException(
+                    status_code=409, detail=f"Page {page.page_index} has no JSON yet"
+                )
+            try:
+                content = merge_items(current, edit.items)
+            except KeyError as e:
+                raise HTTPException(
+                    status_code=400, detail=f"Page {page.page_index} has no item {e}"
+                )
+        else:
+            raise HTTPException(status_code=400, detail="Each edit needs content or items")
+        docs.append((page.json_path, content))
+
+    write_json_files(docs)
+    if payload.run_stage_b:
+        # Outputs no longer match the JSON until Stage B has run again
+        for page in pages.values():
+            page.status = "A_done"
+            page.error = ""
+    db.commit()
+
+    queued = 0
+    if payload.run_stage_b:
+        ordered = sorted(pages.values(), key=lambda p: p.page_index)
+        queued = queue_stage_b.enqueue_pages(
+            "app.workers.stage_b.run_stage_b",
+            [(p.id, job_id, job.priority or 0, p.page_index) for p in ordered],
+        )
+    return {"ok": True, "updated": len(pages), "queued": queued}
+
+
+@router.get("/{job_id}/queue")
+def get_job_queue(job_id: str, db: Session = Depends(get_db)):
+    page_ids = {pid for (pid,) in db.query(Page.id).filter(Page.job_id == job_id)}
+    result = {}
+    for stage, q in (("A", queue_stage_a), ("B", queue_stage_b)):
+        positions = q.positions()
+        running = q.running_page_ids()
+        result[stage] = {
+            "queued": {pid: pos for pid, pos in positions.items() if pid in page_ids},
+            "running": sorted(running & page_ids),
+            "total_queued": len(positions),
+        }
+    return result
+
+
+def _job_exists(job_id: str) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(Job.id).filter(Job.id == job_id).first() is not None
+    finally:
+        db.close()
+
+
+def _progress_snapshot(job_id: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job:
+            return None
+        rows = (
+            db.query(Page.id, Page.page_index, Page.status, Page.error)
+            .filter(Page.job_id == job_id)
+            .order_by(Page.page_index)
+            .all()
+        )
+        return {"job": job_event(job), "pages": [[r[0], r[1], r[2], r[3] or ""] for r in rows]}
+    finally:
+        db.close()
+
+
+def _sse(seq: int, kind: str, data: dict) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"id: {bus.format_id(seq)}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+async def _progress_stream(request: Request, job_id: str, last: Optional[int]):
+    waiter = bus.subscribe(job_id)
+    try:
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            waiter.clear()
+            events = bus.since(job_id, last) if last is not None else None
+            if events is None:
+                # Fresh client, or it fell too far behind: send the whole job once
+                last = bus.current()
+                snapshot = await run_in_threadpool(_progress_snapshot, job_id)
+                yield _sse(last, "snapshot", snapshot or {})
+                continue
+            for seq, kind, data in events:
+                yield _sse(seq, kind, data)
+                last = seq
+            if events:
+                continue
+            try:
+                await asyncio.wait_for(waiter.wait(), timeout=settings.event_keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        bus.unsubscribe(job_id, waiter)
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, request: Request, last_event_id: Optional[str] = None):
+    """Server-Sent Events with page/job status changes.
+
+    The first event is a compact ``snapshot`` of every page; after that only
+    ``page`` and ``job`` changes are sent. Reconnects resume from Last-Event-ID.
+    """
+    if not await run_in_threadpool(_job_exists, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    last = bus.parse_id(request.headers.get("last-event-id") or last_event_id)
+    return StreamingResponse(
+        _progress_stream(request, job_id, last),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{job_id}/export")
-def export_job(job_id: str, db: Session = Depends(get_db)):
+def export_job(job_id: str, request: Request, db: Session = Depends(get_db)):
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    base = Path(ensure_job_dirs(job.id)["base"])
-    out_dir = base / "output"
-    if not out_dir.exists():
+    pages = db.query(Page).filter(Page.job_id == job.id).all()
+    entries = export_entries(pages)
+    if not entries:
         raise HTTPException(status_code=404, detail="No output found")
 
-    cbz_path = base / f"{job.id}.cbz"
-    with zipfile.ZipFile(cbz_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        images = natsorted([p for p in out_dir.iterdir() if p.suffix.lower() in (".png", ".jpg", ".jpeg")])
-        for img in images:
-            zf.write(img, arcname=img.name)
+    signature = export_signature(entries)
+    etag = f'"{signature}"'
+    filename = f"{job.id}.cbz"
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    cache_path = export_cache_path(job.id, signature)
+    if cache_path.exists():
+        return FileResponse(
+            cache_path, filename=filename, media_type="application/zip", headers={"ETag": etag}
+        )
 
-    return FileResponse(cbz_path)
+    ensure_job_dirs(job.id)
+    return StreamingResponse(
+        stream_export(entries, cache_path),
+        media_type="application/zip",
+        headers={"ETag": etag, "Content-Disposition": f'attachment; filename="{filename}"'},
+    )
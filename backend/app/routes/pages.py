@@ -1,13 +1,17 @@
 import json
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
+from ..config import settings
 from ..db import get_db
-from ..models import Page
+from ..models import Page, Job
 from ..schemas import PageOut, JsonUpdateRequest
 from ..queue import queue_stage_a, queue_stage_b
+from ..thumbnails import FORMATS, derivative_etag, derivative_key, derivatives, size_edge
 
 router = APIRouter(prefix="/api/pages", tags=["pages"])
 
@@ -26,33 +30,84 @@ def update_page_json(page_id: str, payload: JsonUpdateRequest, db: Session = Dep
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
 
-    Path(page.json_path).write_text(json.dumps(payload.content, ensure_ascii=False, indent=2), encoding="utf-8")
+    Path(page.json_path).write_text(
+        json.dumps(payload.content, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
     page.status = "A_done"
     db.commit()
     return {"ok": True}
 
 
 @router.post("/{page_id}/rerun")
-def rerun_page(page_id: str, stage: str = "B", db: Session = Depends(get_db)):
+def rerun_page(
+    page_id: str, stage: str = "B", bypass_cache: bool = False, db: Session = Depends(get_db)
+):
     page = db.query(Page).filter(Page.id == page_id).first()
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
+    priority = db.query(Job.priority).filter(Job.id == page.job_id).scalar() or 0
+    entry = (page.id, page.job_id, priority, page.page_index)
     if stage.upper() == "A":
-        queue_stage_a.enqueue("app.workers.stage_a.run_stage_a", page.id)
+        queued = queue_stage_a.enqueue_pages(
+            "app.workers.stage_a.run_stage_a", [entry], use_cache=not bypass_cache
+        )
     else:
-        queue_stage_b.enqueue("app.workers.stage_b.run_stage_b", page.id)
+        queued = queue_stage_b.enqueue_pages("app.workers.stage_b.run_stage_b", [entry])
+    if not queued:
+        # Dedup kept the task that is already queued or running for this page
+        raise HTTPException(status_code=409, detail="Page is already queued or running")
     return {"ok": True}
 
 
+@router.get("/{page_id}/queue")
+def get_page_queue_position(page_id: str):
+    for stage, q in (("A", queue_stage_a), ("B", queue_stage_b)):
+        if page_id in q.running_page_ids():
+            return {"stage": stage, "position": 0, "running": True}
+        position = q.position(page_id)
+        if position is not None:
+            return {"stage": stage, "position": position, "running": False}
+    return {"stage": None, "position": None, "running": False}
+
+
+# Outputs are rewritten in place on rerun, so clients revalidate with the ETag each time
+IMAGE_CACHE_CONTROL = "private, no-cache"
+
+
 @router.get("/{page_id}/image")
-def get_page_image(page_id: str, variant: str = "original", db: Session = Depends(get_db)):
+def get_page_image(
+    page_id: str,
+    request: Request,
+    variant: str = "original",
+    size: str = "full",
+    format: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """``size=thumb|preview`` serves a cached resized copy instead of the full file."""
     page = db.query(Page).filter(Page.id == page_id).first()
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
     path = page.original_path if variant == "original" else page.output_path
-    if not path:
+    if not path or not Path(path).is_file():
         raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(path)
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL}
+    if size == "full":
+        return FileResponse(path, headers=headers)
+    if size_edge(size) is None:
+        raise HTTPException(status_code=400, detail="size must be full, thumb or preview")
+    fmt = format or settings.derivative_format
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail="format must be webp or jpeg")
+
+    key = derivative_key(path, size, fmt)
+    etag = derivative_etag(key)
+    headers["ETag"] = etag
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    image = derivatives.get(path, size, fmt, key)
+    if image.path is not None:
+        return FileResponse(image.path, media_type=image.mime, headers=headers)
+    return Response(image.data, media_type=image.mime, headers=headers)
 
 
 @router.get("/{page_id}", response_model=PageOut)
@@ -5,6 +5,7 @@ from ..db import get_db
 from ..schemas import SettingsOut, SettingsUpdate
 from ..settings_store import get_global_settings, update_global_settings, default_config
 from ..secrets_vault import SecretVaultError
+from ..queue import sync_pool_sizes
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
@@ -30,6 +31,7 @@ def update_settings(payload: SettingsUpdate, db: Session = Depends(get_db)):
         row = update_global_settings(db, cfg, payload.api_key)
     except SecretVaultError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    sync_pool_sizes(row.config)
     return SettingsOut(
         config=row.config,
         api_key_last4=row.api_key_last4,
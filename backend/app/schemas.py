@@ -20,6 +20,11 @@ class JobUpdate(BaseModel):
     api_key: Optional[str] = None
 
 
+class JobConcurrencyUpdate(BaseModel):
+    stage_a_concurrency: Optional[int] = None
+    stage_b_concurrency: Optional[int] = None
+
+
 class JobOut(BaseModel):
     id: str
     title: str
@@ -44,6 +49,21 @@ class JobStatus(BaseModel):
     total_pages: int
     done_pages: int
     pages_done_pct: float = 0
+    # Pages per page status, and the same grouped as queued/running/done per stage
+    counts: Dict[str, int] = {}
+    stages: Dict[str, Dict[str, int]] = {}
+    blocked: int = 0
+    failed: int = 0
+
+
+class ImportTaskOut(BaseModel):
+    id: str
+    job_id: str
+    kind: str
+    status: str
+    total: int
+    done: int
+    error: str
 
 
 class PageOut(BaseModel):
@@ -61,6 +81,12 @@ class PageOut(BaseModel):
         from_attributes = True
 
 
+class ItemList(BaseModel):
+    # Items carry only the requested ``fields``; pass ``next_cursor`` back as ``cursor``
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
 class SettingsOut(BaseModel):
     config: Dict[str, Any]
     api_key_last4: str
@@ -76,5 +102,38 @@ class RerunRequest(BaseModel):
     stage: str
 
 
+class RequeueRequest(BaseModel):
+    # A, B, or auto: Stage B for pages that already have JSON, Stage A for the rest
+    stage: str = "auto"
+    statuses: List[str] = ["failed", "blocked"]
+    error_contains: Optional[str] = None
+    from_index: Optional[int] = None
+    to_index: Optional[int] = None
+    page_ids: Optional[List[str]] = None
+    bypass_cache: bool = False
+    dry_run: bool = False
+
+
+class RequeueResult(BaseModel):
+    matched: int
+    # Pages skipped because a task for them is already queued or running
+    in_flight: int
+    stage_a: List[int] = []
+    stage_b: List[int] = []
+    queued_tasks: int = 0
+
+
 class JsonUpdateRequest(BaseModel):
     content: Dict[str, Any]
+
+
+class JsonPageEdit(BaseModel):
+    page_id: str
+    # Either the whole document, or item patches matched by item ``id``
+    content: Optional[Dict[str, Any]] = None
+    items: Optional[List[Dict[str, Any]]] = None
+
+
+class JsonBatchUpdate(BaseModel):
+    pages: List[JsonPageEdit]
+    run_stage_b: bool = True
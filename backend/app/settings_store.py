@@ -1,9 +1,27 @@
-from typing import Dict, Any
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from .models import GlobalSettings
 from .config import settings
 from .secrets_vault import encrypt_secret, last4, decrypt_secret
 
+PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
+
+# Hot-path caches for workers. The global snapshot is keyed by a version that
+# moves on every settings update in this process and expires after
+# config_cache_ttl so other processes pick up changes too. Job entries are keyed
+# by the snapshot they were built from and Job.updated_at, so they expire with it.
+_cache_lock = threading.Lock()
+_version = 0
+_global_snapshot: Optional[Tuple[int, float, Dict[str, Any], str]] = None
+_job_configs: Dict[str, Tuple[Tuple[int, float, Any], Dict[str, Any], str]] = {}
+_secrets: Dict[str, str] = {}
+_prompt_files: Dict[str, Tuple[int, Any]] = {}
+
 
 def default_config() -> Dict[str, Any]:
     return {
@@ -20,9 +38,21 @@ def default_config() -> Dict[str, Any]:
         "stage_a_timeout": settings.stage_a_timeout,
         "stage_b_timeout": settings.stage_b_timeout,
         "retries": settings.retries,
+        "stage_a_max_edge": settings.stage_a_max_edge,
+        "stage_a_image_format": settings.stage_a_image_format,
+        "stage_a_image_quality": settings.stage_a_image_quality,
         "stage_a_concurrency": settings.stage_a_concurrency,
+        "stage_a_context_mode": settings.stage_a_context_mode,
+        "stage_a_batch_size": settings.stage_a_batch_size,
         "stage_b_concurrency": settings.stage_b_concurrency,
+        "stage_b_incremental": settings.stage_b_incremental,
+        "stage_b_region_padding": settings.stage_b_region_padding,
+        "stage_b_incremental_max_area": settings.stage_b_incremental_max_area,
+        "stage_b_tiling": settings.stage_b_tiling,
+        "stage_b_tile_max_edge": settings.stage_b_tile_max_edge,
         "keep_all_artifacts": settings.keep_all_artifacts,
+        "pdf_dpi": settings.pdf_dpi,
+        "pdf_format": settings.pdf_format,
     }
 
 
@@ -45,7 +75,9 @@ def get_global_settings(db: Session) -> GlobalSettings:
     return row
 
 
-def update_global_settings(db: Session, config: Dict[str, Any], api_key: str | None) -> GlobalSettings:
+def update_global_settings(
+    db: Session, config: Dict[str, Any], api_key: str | None
+) -> GlobalSettings:
     row = get_global_settings(db)
     row.config = config
     if api_key is not None:
@@ -53,17 +85,93 @@ def update_global_settings(db: Session, config: Dict[str, Any], api_key: str | N
         row.api_key_last4 = last4(api_key)
     db.commit()
     db.refresh(row)
+    invalidate_config()
     return row
 
 
-def resolve_job_config(db: Session, job) -> tuple[Dict[str, Any], str]:
-    global_settings = get_global_settings(db)
+def invalidate_config(job_id: str | None = None) -> None:
+    """Drop cached config for one job, or for everything when ``job_id`` is None."""
+    global _version, _global_snapshot
+    with _cache_lock:
+        if job_id is not None:
+            _job_configs.pop(job_id, None)
+            return
+        _version += 1
+        _global_snapshot = None
+        _job_configs.clear()
+
+
+def _global_config(db: Session) -> Tuple[int, float, Dict[str, Any], str]:
+    """(version, loaded_at, config, encrypted key) of the current global snapshot."""
+    global _global_snapshot
+    with _cache_lock:
+        snap = _global_snapshot
+        if snap and snap[0] == _version and time.monotonic() - snap[1] < settings.config_cache_ttl:
+            return snap
+        version = _version
+    row = get_global_settings(db)
     cfg = default_config()
-    if global_settings.config:
-        cfg.update(global_settings.config)
+    if row.config:
+        cfg.update(row.config)
+    snap = (version, time.monotonic(), cfg, row.api_key_encrypted or "")
+    with _cache_lock:
+        if version == _version:
+            _global_snapshot = snap
+    return snap
+
+
+def _decrypt_cached(token: str) -> str:
+    if not token:
+        return ""
+    with _cache_lock:
+        plain = _secrets.get(token)
+    if plain is None:
+        plain = decrypt_secret(token)
+        with _cache_lock:
+            if len(_secrets) >= 256:
+                _secrets.clear()
+            _secrets[token] = plain
+    return plain
+
+
+def resolve_job_config(db: Session, job) -> tuple[Dict[str, Any], str]:
+    # The snapshot check comes first so job entries never outlive a stale global config
+    version, loaded_at, global_cfg, global_key = _global_config(db)
+    stamp = (version, loaded_at, job.updated_at)
+    with _cache_lock:
+        entry = _job_configs.get(job.id)
+    if entry and entry[0] == stamp:
+        return dict(entry[1]), entry[2]
+
+    cfg = dict(global_cfg)
     if job.config:
         cfg.update(job.config)
 
-    api_key_enc = job.api_key_encrypted or global_settings.api_key_encrypted
-    api_key = decrypt_secret(api_key_enc) if api_key_enc else ""
-    return cfg, api_key
+    api_key = _decrypt_cached(job.api_key_encrypted or global_key)
+    with _cache_lock:
+        if version == _version:
+            _job_configs[job.id] = (stamp, cfg, api_key)
+    return dict(cfg), api_key
+
+
+def _read_prompt_file(name: str, parse) -> Any:
+    path = PROMPTS_DIR / name
+    mtime = os.stat(path).st_mtime_ns
+    with _cache_lock:
+        entry = _prompt_files.get(name)
+    if entry and entry[0] == mtime:
+        return entry[1]
+    value = parse(path.read_text(encoding="utf-8"))
+    with _cache_lock:
+        _prompt_files[name] = (mtime, value)
+    return value
+
+
+def load_prompt(name: str) -> str:
+    """Prompt text from app/prompts, re-read only when the file changes."""
+    return _read_prompt_file(name, str)
+
+
+def load_json_prompt(name: str) -> Any:
+    """Parsed JSON from app/prompts (shared between callers; do not mutate)."""
+    return _read_prompt_file(name, json.loads)
@@ -29,5 +29,10 @@ def page_json_path(job_id: str, page_index: int) -> str:
     return str(job_dir(job_id) / "json" / f"{page_index:04d}.json")
 
 
+def page_rendered_json_path(job_id: str, page_index: int) -> str:
+    # The JSON the current output was rendered from, for incremental re-renders
+    return str(job_dir(job_id) / "intermediate" / f"{page_index:04d}.rendered.json")
+
+
 def page_output_path(job_id: str, page_index: int, ext: str = "png") -> str:
     return str(job_dir(job_id) / "output" / f"{page_index:04d}.{ext}")
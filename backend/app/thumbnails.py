@@ -0,0 +1,121 @@
+"""Resized page images for the viewer, generated once and served from disk.
+
+Derivatives are keyed on the source path, mtime and size, so a re-rendered
+output gets a new key (and ETag) while untouched pages keep hitting the cache.
+Concurrent requests for the same derivative share one resize.
+"""
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image
+
+from .config import settings
+from .disk_cache import DiskCache, hash_parts
+from .imaging import FORMAT_MIME
+
+FORMATS = ("webp", "jpeg")
+SUFFIX = {"webp": ".webp", "jpeg": ".jpg"}
+
+derivative_cache = DiskCache("derivatives", settings.derivative_cache_mb * 1024 * 1024)
+
+
+def size_edge(size: str) -> Optional[int]:
+    return {"thumb": settings.thumb_edge, "preview": settings.preview_edge}.get(size)
+
+
+@dataclass
+class Derivative:
+    key: str
+    mime: str
+    path: Optional[Path] = None
+    data: Optional[bytes] = None
+
+    @property
+    def etag(self) -> str:
+        return derivative_etag(self.key)
+
+
+def derivative_key(source: str, size: str, fmt: str) -> str:
+    st = os.stat(source)
+    return hash_parts(
+        source, str(st.st_mtime_ns), str(st.st_size), size, str(size_edge(size)), fmt,
+        str(settings.derivative_quality),
+    )
+
+
+def derivative_etag(key: str) -> str:
+    return f'"{key[:32]}"'
+
+
+def render(source: str, edge: int, fmt: str) -> bytes:
+    with Image.open(source) as img:
+        img.draft("RGB", (edge, edge))  # JPEG sources decode at reduced scale
+        out = img.copy()
+    out.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+    if fmt == "jpeg" and out.mode not in ("RGB", "L"):
+        out = out.convert("RGB")
+    elif out.mode not in ("RGB", "RGBA", "L"):
+        out = out.convert("RGBA")
+    buf = io.BytesIO()
+    out.save(buf, format=fmt.upper(), quality=settings.derivative_quality)
+    return buf.getvalue()
+
+
+class DerivativeStore:
+    """Cache lookups plus a bounded resize pool with per-key request coalescing."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                workers = settings.derivative_workers or os.cpu_count() or 1
+                self._pool = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="derivative"
+                )
+            return self._pool
+
+    def get(self, source: str, size: str, fmt: str, key: Optional[str] = None) -> Derivative:
+        key = key or derivative_key(source, size, fmt)
+        result = Derivative(key, FORMAT_MIME[fmt])
+        cached = derivative_cache.get(key, SUFFIX[fmt])
+        if cached is not None:
+            result.path = cached
+            return result
+        with self._lock:
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+        if owner:
+            self._executor().submit(self._build, future, key, source, size, fmt)
+        result.data = future.result()
+        return result
+
+    def _build(self, future: Future, key: str, source: str, size: str, fmt: str) -> None:
+        try:
+            data = render(source, size_edge(size), fmt)
+            derivative_cache.put_bytes(key, data, SUFFIX[fmt])
+            future.set_result(data)
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+derivatives = DerivativeStore()
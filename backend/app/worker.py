@@ -0,0 +1,56 @@
+"""Standalone Stage A/B worker process.
+
+Run ``python -m app.worker --stages a,b`` next to an API started with
+``WORKER_MODE=external``. Workers claim tasks from the shared tasks table, so
+any number of them can run against the same database and data dir.
+"""
+import argparse
+import logging
+import signal
+import threading
+
+from .config import settings
+from .db import init_db
+from .progress import backfill_counts
+from .queue import start_queues, shutdown_queues, pin_pool_sizes
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.worker", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--stages", default="a,b", help="comma separated stages to run: a, b")
+    parser.add_argument(
+        "--stage-a-concurrency", type=int, help="fixed pool size (default: follow global settings)"
+    )
+    parser.add_argument(
+        "--stage-b-concurrency", type=int, help="fixed pool size (default: follow global settings)"
+    )
+    args = parser.parse_args(argv)
+
+    stages = {s.strip().lower() for s in args.stages.split(",") if s.strip()}
+    if not stages or not stages <= {"a", "b"}:
+        parser.error("--stages must be a comma separated subset of a,b")
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    if args.stage_a_concurrency or args.stage_b_concurrency:
+        settings.stage_a_concurrency = args.stage_a_concurrency or settings.stage_a_concurrency
+        settings.stage_b_concurrency = args.stage_b_concurrency or settings.stage_b_concurrency
+        pin_pool_sizes()
+
+    init_db()
+    backfill_counts()
+    start_queues("".join(sorted(stages)), mode="db")
+    logging.getLogger(__name__).info("worker started for stages %s", ",".join(sorted(stages)))
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    stop.wait()
+    shutdown_queues()
+
+
+if __name__ == "__main__":
+    main()
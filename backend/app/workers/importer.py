@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from natsort import natsorted
+
+from ..db import SessionLocal
+from ..models import Job, Page
+from ..storage import page_original_path, page_json_path
+from ..config import settings
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp")
+
+# Import progress is only needed while the request is in flight, keep it in memory
+_tasks: Dict[str, Dict[str, Any]] = {}
+_tasks_lock = threading.Lock()
+
+
+def create_task(job_id: str, kind: str) -> Dict[str, Any]:
+    task = {
+        "id": str(uuid.uuid4()),
+        "job_id": job_id,
+        "kind": kind,
+        "status": "queued",
+        "total": 0,
+        "done": 0,
+        "error": "",
+    }
+    with _tasks_lock:
+        _tasks[task["id"]] = task
+    return task
+
+
+def get_task(task_id: str) -> Optional[Dict[str, Any]]:
+    with _tasks_lock:
+        task = _tasks.get(task_id)
+        return dict(task) if task else None
+
+
+def _update(task_id: str, **fields) -> None:
+    with _tasks_lock:
+        _tasks[task_id].update(fields)
+
+
+def _add_page(db, job_id: str, page_index: int, img_path: str) -> None:
+    db.add(
+        Page(
+            job_id=job_id,
+            page_index=page_index,
+            status="queued",
+            original_path=img_path,
+            json_path=page_json_path(job_id, page_index),
+        )
+    )
+
+
+# (page_index, image path) written by one import, removed again if the import fails
+Created = List[Tuple[int, str]]
+
+
+def _import_zip(db, task_id: str, job_id: str, spool_path: str, created: Created) -> int:
+    batch = max(1, settings.import_batch_size)
+    with zipfile.ZipFile(spool_path) as zf:
+        names = natsorted(n for n in zf.namelist() if n.lower().endswith(IMAGE_EXTS))
+        if not names:
+            raise ValueError("No images found in archive")
+        _update(task_id, total=len(names))
+
+        for idx, name in enumerate(names):
+            ext = name.split(".")[-1].lower()
+            img_path = page_original_path(job_id, idx + 1, ext)
+            created.append((idx + 1, img_path))
+            with zf.open(name) as src, open(img_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            _add_page(db, job_id, idx + 1, img_path)
+            if (idx + 1) % batch == 0:
+                db.commit()
+            _update(task_id, done=idx + 1)
+    db.commit()
+    return len(names)
+
+
+def _render_pdf_range(
+    spool_path: str, first: int, last: int, dpi: int, fmt: str, out_dir: str
+) -> list[str]:
+    # Runs in a worker process; pdftoppm writes straight to disk so no page is held in memory
+    from pdf2image import convert_from_path
+
+    return convert_from_path(
+        spool_path,
+        dpi=dpi,
+        fmt=fmt,
+        first_page=first,
+        last_page=last,
+        output_folder=out_dir,
+        output_file=f"r{first:05d}",
+        paths_only=True,
+    )
+
+
+def _import_pdf(db, task_id: str, job_id: str, spool_path: str, cfg: dict, created: Created) -> int:
+    from pdf2image import pdfinfo_from_path
+
+    page_count = int(pdfinfo_from_path(spool_path).get("Pages", 0))
+    if not page_count:
+        raise ValueError("No pages rendered from PDF")
+    _update(task_id, total=page_count)
+
+    dpi = int(cfg.get("pdf_dpi", settings.pdf_dpi))
+    fmt = "jpeg" if cfg.get("pdf_format", settings.pdf_format) in ("jpeg", "jpg") else "png"
+    ext = "jpg" if fmt == "jpeg" else "png"
+    step = max(1, settings.pdf_pages_per_task)
+    workers = settings.pdf_workers or os.cpu_count() or 1
+    render_dir = Path(spool_path).with_suffix(".pages")
+    render_dir.mkdir(parents=True, exist_ok=True)
+
+    ranges = [
+        (first, min(first + step - 1, page_count)) for first in range(1, page_count + 1, step)
+    ]
+    # spawn: forking the threaded API process is not safe
+    ctx = multiprocessing.get_context("spawn")
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=ctx) as pool:
+            futures = {
+                pool.submit(
+                    _render_pdf_range, spool_path, first, last, dpi, fmt, str(render_dir)
+                ): first
+                for first, last in ranges
+            }
+            for fut in as_completed(futures):
+                first = futures[fut]
+                rendered_paths = fut.result()
+                for offset, rendered in enumerate(rendered_paths):
+                    page_index = first + offset
+                    img_path = page_original_path(job_id, page_index, ext)
+                    created.append((page_index, img_path))
+                    os.replace(rendered, img_path)
+                    _add_page(db, job_id, page_index, img_path)
+                db.commit()
+                done += len(rendered_paths)
+                _update(task_id, done=done)
+    finally:
+        shutil.rmtree(render_dir, ignore_errors=True)
+    return page_count
+
+
+def _discard_pages(db, job_id: str, created: Created) -> None:
+    """Remove the pages and files of a failed import, so a retry starts from a clean job."""
+    indexes = [page_index for page_index, _ in created]
+    for start in range(0, len(indexes), 500):
+        chunk = indexes[start:start + 500]
+        for page in db.query(Page).filter(Page.job_id == job_id, Page.page_index.in_(chunk)):
+            db.delete(page)
+    db.commit()
+    for _, img_path in created:
+        Path(img_path).unlink(missing_ok=True)
+
+
+def run_import(task_id: str, job_id: str, spool_path: str) -> None:
+    task = get_task(task_id)
+    if not task:
+        return
+    db = SessionLocal()
+    created: Created = []
+    try:
+        _update(task_id, status="running")
+        if task["kind"] == "pdf":
+            job = db.query(Job).filter(Job.id == job_id).first()
+            cfg = (job.config if job else None) or {}
+            count = _import_pdf(db, task_id, job_id, spool_path, cfg, created)
+        else:
+            count = _import_zip(db, task_id, job_id, spool_path, created)
+
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job:
+            job.total_pages = count
+            job.status = "ready"
+        db.commit()
+        _update(task_id, status="done")
+    except Exception as e:
+        db.rollback()
+        _discard_pages(db, job_id, created)
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job:
+            job.status = "failed"
+            db.commit()
+        _update(task_id, status="failed", error=str(e), done=0)
+    finally:
+        db.close()
+        Path(spool_path).unlink(missing_ok=True)
@@ -0,0 +1,74 @@
+"""Drivers for stage step generators.
+
+A stage is written as a generator that does its DB and disk work inline and
+``yield``s the keyword arguments of the single model call it needs; the result
+(or the exception) is sent back in. The same generator then runs on a worker
+thread (``drive``) or on the asyncio runtime (``drive_async``), where every
+synchronous step goes to the blocking pool and only the model call is awaited.
+
+A step may also yield a list of requests; they run concurrently and the list of
+results comes back in the same order (or the first failure is thrown in).
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Generator, List, Tuple, Union
+
+from ..async_runtime import run_blocking
+from ..config import settings
+
+Request = Union[dict, List[dict]]
+Steps = Generator[Request, Any, None]
+
+
+def _step(gen: Steps, method: str, arg: Any = None) -> Tuple[bool, Any]:
+    # StopIteration cannot cross a Future, so report completion as a flag
+    try:
+        if method == "next":
+            return False, next(gen)
+        return False, getattr(gen, method)(arg)
+    except StopIteration:
+        return True, None
+
+
+def _fan_out(call: Callable[..., Any], requests: List[dict]) -> List[Any]:
+    if len(requests) == 1:
+        return [call(**requests[0])]
+    workers = max(1, min(len(requests), settings.stage_b_region_parallelism))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fan-out") as pool:
+        futures = [pool.submit(call, **request) for request in requests]
+        return [f.result() for f in futures]
+
+
+async def _fan_out_async(call: Callable[..., Awaitable[Any]], requests: List[dict]) -> List[Any]:
+    limit = asyncio.Semaphore(max(1, settings.stage_b_region_parallelism))
+
+    async def one(request: dict) -> Any:
+        async with limit:
+            return await call(**request)
+
+    return list(await asyncio.gather(*(one(r) for r in requests)))
+
+
+def drive(gen: Steps, call: Callable[..., Any]) -> None:
+    done, request = _step(gen, "next")
+    while not done:
+        try:
+            result = _fan_out(call, request) if isinstance(request, list) else call(**request)
+        except Exception as e:
+            done, request = _step(gen, "throw", e)
+            continue
+        done, request = _step(gen, "send", result)
+
+
+async def drive_async(gen: Steps, call: Callable[..., Awaitable[Any]]) -> None:
+    done, request = await run_blocking(_step, gen, "next")
+    while not done:
+        try:
+            if isinstance(request, list):
+                result = await _fan_out_async(call, request)
+            else:
+                result = await call(**request)
+        except Exception as e:
+            done, request = await run_blocking(_step, gen, "throw", e)
+            continue
+        done, request = await run_blocking(_step, gen, "send", result)
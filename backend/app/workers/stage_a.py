@@ -1,59 +1,115 @@
 import json
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
 from sqlalchemy.orm import Session
 
 from ..db import SessionLocal
 from ..models import Page, Job
-from ..llm_gateway import call_stage_a
+from ..llm_gateway import call_stage_a, call_stage_a_async
 from ..storage import page_json_path
 from ..config import settings
-from ..settings_store import resolve_job_config
+from ..settings_store import load_json_prompt, load_prompt, resolve_job_config
+from ..page_writer import page_writer
+from ..disk_cache import DiskCache, hash_file, hash_parts
+from ..imaging import prepare_for_upload
+from .runner import drive, drive_async
+
+result_cache = DiskCache("stage_a", settings.stage_a_cache_mb * 1024 * 1024)
 
 
 def _load_prompt() -> str:
-    prompt_path = Path(__file__).resolve().parent.parent / "prompts" / "gem1.txt"
-    return prompt_path.read_text(encoding="utf-8")
+    return load_prompt("gem1.txt")
+
+
+def _load_batch_prompt() -> str:
+    return load_prompt("batch_a.txt")
 
 
 def _load_schema() -> dict:
-    schema_path = Path(__file__).resolve().parent.parent / "prompts" / "json_schema.json"
-    return json.loads(schema_path.read_text(encoding="utf-8"))
+    return load_json_prompt("json_schema.json")
 
 
-def _build_context(job: Job, page: Page, db: Session) -> str:
-    # Opportunistic context: use previous/next page JSON if available
-    context_parts = []
-    prev_page = (
-        db.query(Page)
-        .filter(Page.job_id == job.id, Page.page_index == page.page_index - 1)
-        .first()
-    )
-    next_page = (
-        db.query(Page)
-        .filter(Page.job_id == job.id, Page.page_index == page.page_index + 1)
-        .first()
-    )
+def _summarize(data: dict) -> str:
+    texts = []
+    for item in data.get("items", []):
+        cn = item.get("cn_text")
+        jp = item.get("jp_text")
+        if cn:
+            texts.append(cn)
+        elif jp:
+            texts.append(jp)
+    return " ".join(texts)[:500]
+
+
+class SummaryCache:
+    """Neighbour summaries per job, so a page's JSON is parsed once rather than by both neighbours.
 
-    def summarize_json(p: Page) -> str:
-        if not p or not p.json_path:
+    Entries are checked against the file's mtime, so edits made through the API
+    are picked up. Only the most recently used ``max_jobs`` jobs are kept.
+    """
+
+    def __init__(self, max_jobs: int = 32) -> None:
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, Dict[int, Tuple[str, int, str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _job(self, job_id: str) -> Dict[int, Tuple[str, int, str]]:
+        # Caller holds the lock
+        entries = self._jobs.get(job_id)
+        if entries is None:
+            entries = self._jobs[job_id] = {}
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        else:
+            self._jobs.move_to_end(job_id)
+        return entries
+
+    def get(self, page: Optional[Page]) -> str:
+        if not page or not page.json_path:
+            return ""
+        try:
+            mtime = os.stat(page.json_path).st_mtime_ns
+        except OSError:
             return ""
+        with self._lock:
+            entry = self._job(page.job_id).get(page.page_index)
+        if entry and entry[0] == page.json_path and entry[1] == mtime:
+            return entry[2]
         try:
-            data = json.loads(Path(p.json_path).read_text(encoding="utf-8"))
-            texts = []
-            for item in data.get("items", []):
-                cn = item.get("cn_text")
-                jp = item.get("jp_text")
-                if cn:
-                    texts.append(cn)
-                elif jp:
-                    texts.append(jp)
-            summary = " ".join(texts)
-            return summary[:500]
+            summary = _summarize(json.loads(Path(page.json_path).read_text(encoding="utf-8")))
         except Exception:
             return ""
+        with self._lock:
+            self._job(page.job_id)[page.page_index] = (page.json_path, mtime, summary)
+        return summary
+
+    def put(self, job_id: str, page_index: int, json_path: str, data: dict) -> None:
+        try:
+            mtime = os.stat(json_path).st_mtime_ns
+        except OSError:
+            return
+        with self._lock:
+            self._job(job_id)[page_index] = (json_path, mtime, _summarize(data))
+
+
+summary_cache = SummaryCache()
 
-    prev_summary = summarize_json(prev_page)
-    next_summary = summarize_json(next_page)
+
+def _build_context(job: Job, page: Page, db: Session) -> str:
+    # Neighbour JSON is used when it exists; wave scheduling makes sure the previous page is done
+    context_parts = []
+    neighbours = {
+        p.page_index: p
+        for p in db.query(Page).filter(
+            Page.job_id == job.id, Page.page_index.in_((page.page_index - 1, page.page_index + 1))
+        )
+    }
+    prev_summary = summary_cache.get(neighbours.get(page.page_index - 1))
+    next_summary = summary_cache.get(neighbours.get(page.page_index + 1))
 
     if prev_summary:
         context_parts.append(f"上一页摘要: {prev_summary}")
@@ -66,7 +122,100 @@ def _build_context(job: Job, page: Page, db: Session) -> str:
     return "\n".join(context_parts)
 
 
-def run_stage_a(page_id: str) -> None:
+def _prep_options(cfg: dict) -> tuple[int, str, int]:
+    return (
+        int(cfg.get("stage_a_max_edge", settings.stage_a_max_edge) or 0),
+        str(cfg.get("stage_a_image_format", settings.stage_a_image_format) or "original"),
+        int(cfg.get("stage_a_image_quality", settings.stage_a_image_quality)),
+    )
+
+
+def _cache_key(
+    image_path: str, prompt: str, schema: dict | None, cfg: dict, context_text: str
+) -> str:
+    return hash_parts(
+        hash_file(image_path),
+        prompt,
+        json.dumps(schema, sort_keys=True) if schema else "",
+        str(cfg.get("model_a", settings.model_a)),
+        str(cfg.get("model_a_protocol", settings.model_a_protocol)),
+        json.dumps(_prep_options(cfg)),
+        context_text,
+    )
+
+
+def _valid_result(data: Any) -> bool:
+    """Shape check for one page of a batched response before it replaces a single call."""
+    if not isinstance(data, dict) or not isinstance(data.get("items"), list):
+        return False
+    for item in data["items"]:
+        if not isinstance(item, dict):
+            return False
+        bbox = item.get("bbox_norm")
+        if not isinstance(bbox, list) or len(bbox) != 4:
+            return False
+        if not all(isinstance(v, (int, float)) and -0.01 <= v <= 1.01 for v in bbox):
+            return False
+    return True
+
+
+def _single_call(
+    db: Session, page: Page, prompt: str, context_text: str, schema, cfg: dict, api_key: str
+):
+    prepared = prepare_for_upload(page.original_path, *_prep_options(cfg))
+    page.meta = {**(page.meta or {}), "stage_a_upload": prepared.meta()}
+    # Release the connection while the model call is in flight
+    db.commit()
+    return (
+        yield dict(
+            image_path=page.original_path,
+            prompt=prompt,
+            context_text=context_text,
+            schema=schema,
+            cfg=cfg,
+            api_key=api_key,
+            image_bytes=prepared.data,
+            image_mime=prepared.mime,
+        )
+    )
+
+
+def _finish_page(
+    db: Session, job: Job, page: Page, json_data: dict, cache_key: str, cache: str
+) -> None:
+    json_path = page_json_path(job.id, page.page_index)
+    Path(json_path).write_text(
+        json.dumps(json_data, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    page.json_path = json_path
+    summary_cache.put(job.id, page.page_index, json_path, json_data)
+    page.meta = {
+        **(page.meta or {}),
+        "stage_a_cache": cache,
+        "stage_a_key": cache_key,
+    }
+    page_writer.finalize(page, "A_done")
+    db.commit()
+
+    # Enqueue stage B if auto
+    if job.config.get("qa_mode", settings.qa_mode) == "auto":
+        from ..queue import queue_stage_b
+
+        queue_stage_b.enqueue_page(
+            "app.workers.stage_b.run_stage_b", page.id, job.id, job.priority, page.page_index
+        )
+
+
+def _fail_page(db: Session, page_id: str, error: str) -> None:
+    db.rollback()
+    page = db.query(Page).filter(Page.id == page_id).first()
+    if page:
+        page_writer.finalize(page, "failed")
+        page.error = error
+        db.commit()
+
+
+def _stage_a_steps(page_id: str, use_cache: bool):
     db = SessionLocal()
     try:
         page = db.query(Page).filter(Page.id == page_id).first()
@@ -76,43 +225,144 @@ def run_stage_a(page_id: str) -> None:
         if not job:
             return
 
-        page.status = "A_running"
-        db.commit()
+        page_writer.set_status(page.id, "A_running", page.status)
 
         prompt = _load_prompt()
         context_text = _build_context(job, page, db)
         cfg, api_key = resolve_job_config(db, job)
         use_schema = cfg.get("model_a_use_schema", settings.model_a_use_schema)
         schema = _load_schema() if use_schema else None
-        if not api_key:
-            raise ValueError("API key is missing")
-        json_data = call_stage_a(
-            page.original_path,
-            prompt,
-            context_text,
-            schema=schema,
-            cfg=cfg,
-            api_key=api_key,
-        )
+        cache_key = _cache_key(page.original_path, prompt, schema, cfg, context_text)
+        cached = result_cache.get_bytes(cache_key, ".json") if use_cache else None
+        if cached is not None:
+            json_data = json.loads(cached)
+        else:
+            if not api_key:
+                raise ValueError("API key is missing")
+            json_data = yield from _single_call(
+                db, page, prompt, context_text, schema, cfg, api_key
+            )
+            result_cache.put_bytes(
+                cache_key, json.dumps(json_data, ensure_ascii=False).encode("utf-8"), ".json"
+            )
 
-        # Save JSON
-        json_path = page_json_path(job.id, page.page_index)
-        Path(json_path).write_text(json.dumps(json_data, ensure_ascii=False, indent=2), encoding="utf-8")
-        page.json_path = json_path
-        page.status = "A_done"
-        db.commit()
+        _finish_page(db, job, page, json_data, cache_key, "hit" if cached is not None else "miss")
 
-        # Enqueue stage B if auto
-        if job.config.get("qa_mode", settings.qa_mode) == "auto":
-            from ..queue import queue_stage_b
+    except Exception as e:
+        _fail_page(db, page_id, str(e))
+    finally:
+        db.close()
 
-            queue_stage_b.enqueue("app.workers.stage_b.run_stage_b", page.id)
 
-    except Exception as e:
-        page = db.query(Page).filter(Page.id == page_id).first()
-        if page:
-            page.status = "failed"
-            page.error = str(e)
+def _stage_a_batch_steps(page_ids: List[str], use_cache: bool):
+    """Stage A for consecutive pages in one request; pages the batch got wrong retry one by one."""
+    db = SessionLocal()
+    settled = set()  # pages already finished or failed on their own
+    try:
+        pages = db.query(Page).filter(Page.id.in_(page_ids)).order_by(Page.page_index).all()
+        if not pages:
+            return
+        job = db.query(Job).filter(Job.id == pages[0].job_id).first()
+        if not job:
+            return
+        for page in pages:
+            page_writer.set_status(page.id, "A_running", page.status)
+
+        prompt = _load_prompt()
+        cfg, api_key = resolve_job_config(db, job)
+        use_schema = cfg.get("model_a_use_schema", settings.model_a_use_schema)
+        schema = _load_schema() if use_schema else None
+
+        todo = []
+        for page in pages:
+            try:
+                context_text = _build_context(job, page, db)
+                cache_key = _cache_key(page.original_path, prompt, schema, cfg, context_text)
+                cached = result_cache.get_bytes(cache_key, ".json") if use_cache else None
+                if cached is not None:
+                    _finish_page(db, job, page, json.loads(cached), cache_key, "hit")
+                    settled.add(page.id)
+                else:
+                    todo.append((page.id, context_text, cache_key))
+            except Exception as e:
+                _fail_page(db, page.id, str(e))
+                settled.add(page.id)
+        if todo and not api_key:
+            for page_id, _, _ in todo:
+                _fail_page(db, page_id, "API key is missing")
+                settled.add(page_id)
+            return
+
+        results: Dict[str, Any] = {}
+        if len(todo) > 1:
+            batch = []
+            for page_id, context_text, _ in todo:
+                page = db.query(Page).filter(Page.id == page_id).first()
+                prepared = prepare_for_upload(page.original_path, *_prep_options(cfg))
+                page.meta = {**(page.meta or {}), "stage_a_upload": prepared.meta()}
+                batch.append(
+                    dict(
+                        key=str(page.page_index),
+                        image_bytes=prepared.data,
+                        image_mime=prepared.mime,
+                        context_text=context_text,
+                    )
+                )
             db.commit()
+            try:
+                results = yield dict(
+                    image_path=None,
+                    prompt=f"{prompt}\n\n{_load_batch_prompt()}",
+                    context_text="",
+                    schema=schema,
+                    cfg=cfg,
+                    api_key=api_key,
+                    batch=batch,
+                )
+            except Exception:
+                # Whole request failed; every page falls back to its own call
+                results = {}
+
+        for page_id, context_text, cache_key in todo:
+            try:
+                page = db.query(Page).filter(Page.id == page_id).first()
+                if not page:
+                    continue
+                json_data = results.get(str(page.page_index))
+                batched = _valid_result(json_data)
+                if not batched:
+                    json_data = yield from _single_call(
+                        db, page, prompt, context_text, schema, cfg, api_key
+                    )
+                result_cache.put_bytes(
+                    cache_key, json.dumps(json_data, ensure_ascii=False).encode("utf-8"), ".json"
+                )
+                page.meta = {**(page.meta or {}), "stage_a_batch": len(todo) if batched else 0}
+                _finish_page(db, job, page, json_data, cache_key, "miss")
+                settled.add(page_id)
+            except Exception as e:
+                _fail_page(db, page_id, str(e))
+                settled.add(page_id)
+    except Exception as e:
+        for page_id in page_ids:
+            if page_id not in settled:
+                _fail_page(db, page_id, str(e))
     finally:
         db.close()
+
+
+def _steps(page_id: str, use_cache: bool, batch: Optional[List[str]]):
+    if batch and len(batch) > 1:
+        return _stage_a_batch_steps(batch, use_cache)
+    return _stage_a_steps(page_id, use_cache)
+
+
+def run_stage_a(page_id: str, use_cache: bool = True, batch: Optional[List[str]] = None) -> None:
+    """Run Stage A for ``page_id``, or for all pages in ``batch`` (which starts with it)."""
+    drive(_steps(page_id, use_cache, batch), call_stage_a)
+
+
+async def run_stage_a_async(
+    page_id: str, use_cache: bool = True, batch: Optional[List[str]] = None
+) -> None:
+    await drive_async(_steps(page_id, use_cache, batch), call_stage_a_async)
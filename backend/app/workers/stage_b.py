@@ -1,18 +1,26 @@
 import json
 from pathlib import Path
-from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from PIL import Image
 
 from ..db import SessionLocal
 from ..models import Page, Job
-from ..llm_gateway import call_stage_b
-from ..storage import page_output_path
+from ..llm_gateway import call_stage_b, call_stage_b_async
+from ..storage import page_output_path, page_rendered_json_path
+from ..page_json import load_json, write_json_files
+from .. import regions
 from ..config import settings
-from ..settings_store import resolve_job_config
+from ..settings_store import load_prompt, resolve_job_config
+from ..page_writer import page_writer
+from ..disk_cache import DiskCache, hash_file, hash_parts
+from .runner import drive, drive_async
+
+render_cache = DiskCache("stage_b", settings.stage_b_cache_mb * 1024 * 1024)
 
 
 def _load_prompt() -> str:
-    prompt_path = Path(__file__).resolve().parent.parent / "prompts" / "gem2.txt"
-    return prompt_path.read_text(encoding="utf-8")
+    return load_prompt("gem2.txt")
 
 
 def _filter_items_for_auto(json_data: dict) -> dict:
@@ -29,7 +37,118 @@ def _filter_items_for_auto(json_data: dict) -> dict:
     return new_data
 
 
-def run_stage_b(page_id: str) -> None:
+def _incremental_plan(
+    page: Page, json_data: dict, image_sha: str, render_sig: str, cfg: dict
+) -> Optional[List[regions.Box]]:
+    """Regions to re-render on top of the current output, or None for a full render.
+
+    Only applies when the output was rendered from the same image with the same
+    model settings, and the edits since then cover a small part of the page.
+    """
+    if not cfg.get("stage_b_incremental", settings.stage_b_incremental):
+        return None
+    meta = page.meta or {}
+    if meta.get("stage_b_image_sha") != image_sha or meta.get("stage_b_render_sig") != render_sig:
+        return None
+    if not page.output_path or not Path(page.output_path).is_file():
+        return None
+    previous = load_json(page_rendered_json_path(page.job_id, page.page_index))
+    if previous is None:
+        return None
+    seeds = regions.changed_seeds(previous, json_data)
+    if seeds is None:
+        return None
+    with Image.open(page.original_path) as img:
+        width, height = img.size
+    padding = int(float(cfg.get("stage_b_region_padding", settings.stage_b_region_padding)))
+    boxes = regions.plan_regions(
+        seeds, json_data.get("items", []), padding / width, padding / height
+    )
+    max_area = float(cfg.get("stage_b_incremental_max_area", settings.stage_b_incremental_max_area))
+    if sum(regions.area(b) for b in boxes) > max_area:
+        return None
+    return boxes
+
+
+def _tile_plan(page: Page, json_data: dict, cfg: dict) -> Optional[List[regions.Box]]:
+    """Tiles covering every item, or None when the page is rendered in one call.
+
+    Items are clustered by ``bbox_norm`` (padded boxes that touch form one
+    cluster) and neighbouring clusters are combined up to the tile size.
+    """
+    tiling = str(cfg.get("stage_b_tiling", settings.stage_b_tiling))
+    if tiling not in ("auto", "always"):
+        return None
+    with Image.open(page.original_path) as img:
+        width, height = img.size
+    max_edge = int(float(cfg.get("stage_b_tile_max_edge", settings.stage_b_tile_max_edge)))
+    if tiling == "auto" and max(width, height) <= max_edge:
+        return None
+    items = json_data.get("items", [])
+    padding = int(float(cfg.get("stage_b_region_padding", settings.stage_b_region_padding)))
+    seeds = [regions.item_box(i) for i in items]
+    if None in seeds:
+        return None
+    clusters = regions.plan_regions(seeds, items, padding / width, padding / height)
+    return regions.group_tiles(clusters, max_edge / width, max_edge / height)
+
+
+def _render_regions(
+    page: Page,
+    base: Image.Image,
+    boxes: List[regions.Box],
+    json_data: dict,
+    prompt: str,
+    cfg: dict,
+    api_key: str,
+):
+    """Render ``boxes`` from the original and composite them into ``base`` (PNG bytes out).
+
+    Regions without items get the original pixels back (their lettering was
+    removed from the JSON). The rest go to model B together as one fan-out step.
+    """
+    with Image.open(page.original_path) as img:
+        original = img.convert("RGB")
+    padding = int(float(cfg.get("stage_b_region_padding", settings.stage_b_region_padding)))
+    feather = max(1, round(padding / 2 * base.width / original.width))
+
+    requests, targets = [], []
+    for box in boxes:
+        patch = regions.crop(original, box)
+        inside = regions.items_within(box, json_data.get("items", []))
+        if not inside:
+            regions.composite(base, patch, box, feather)
+            continue
+        payload = {
+            **json_data,
+            "image_meta": {"width": patch.width, "height": patch.height},
+            "items": inside,
+        }
+        requests.append(
+            dict(
+                image_path=page.original_path,
+                prompt=prompt,
+                json_payload=payload,
+                cfg=cfg,
+                api_key=api_key,
+                image_bytes=regions.encode_png(patch),
+                image_mime="image/png",
+            )
+        )
+        targets.append(box)
+    if requests:
+        results = yield requests
+        for box, data in zip(targets, results):
+            regions.composite(base, regions.decode(data, base.mode), box, feather)
+    return regions.encode_png(base)
+
+
+def _open_base(path: str) -> Image.Image:
+    with Image.open(path) as img:
+        return img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+
+def _stage_b_steps(page_id: str):
     db = SessionLocal()
     try:
         page = db.query(Page).filter(Page.id == page_id).first()
@@ -45,8 +164,7 @@ def run_stage_b(page_id: str) -> None:
             db.commit()
             return
 
-        page.status = "B_running"
-        db.commit()
+        page_writer.set_status(page.id, "B_running", page.status)
 
         prompt = _load_prompt()
         json_data = json.loads(Path(page.json_path).read_text(encoding="utf-8"))
@@ -61,32 +179,100 @@ def run_stage_b(page_id: str) -> None:
                 for item in json_data.get("items", [])
             )
             if needs:
-                page.status = "blocked"
+                page_writer.finalize(page, "blocked")
                 page.error = "Needs user confirm"
                 db.commit()
                 return
         else:
             json_data = _filter_items_for_auto(json_data)
 
-        if not api_key:
-            raise ValueError("API key is missing")
-        img_bytes = call_stage_b(page.original_path, prompt, json_data, cfg=cfg, api_key=api_key)
+        image_sha = hash_file(page.original_path)
+        json_sha = hash_parts(json.dumps(json_data, ensure_ascii=False, sort_keys=True))
+        cache_key = hash_parts(
+            image_sha,
+            json_sha,
+            prompt,
+            str(cfg.get("model_b", settings.model_b)),
+            str(cfg.get("model_b_protocol", settings.model_b_protocol)),
+            str(cfg.get("model_b_endpoint", settings.model_b_endpoint)),
+        )
+        render_sig = hash_parts(
+            prompt,
+            str(cfg.get("model_b", settings.model_b)),
+            str(cfg.get("model_b_protocol", settings.model_b_protocol)),
+            str(cfg.get("model_b_endpoint", settings.model_b_endpoint)),
+        )
+        tiles = _tile_plan(page, json_data, cfg)
+        if tiles is not None:
+            # A tiled render is a different image than a one-call render of the same JSON
+            cache_key = hash_parts(cache_key, "tiles", json.dumps(tiles))
+        img_bytes = render_cache.get_bytes(cache_key, ".png")
+        cache_hit = img_bytes is not None
+        mode, boxes = "cache", None
+        if not cache_hit:
+            if not api_key:
+                raise ValueError("API key is missing")
+            boxes = _incremental_plan(page, json_data, image_sha, render_sig, cfg)
+            # Release the connection while the model call is in flight
+            db.commit()
+            if boxes is not None:
+                mode = "incremental"
+                if boxes:
+                    base = _open_base(page.output_path)
+                    img_bytes = yield from _render_regions(
+                        page, base, boxes, json_data, prompt, cfg, api_key
+                    )
+                else:
+                    img_bytes = Path(page.output_path).read_bytes()
+            elif tiles is not None:
+                mode, boxes = "tiled", tiles
+                base = _open_base(page.original_path)
+                img_bytes = yield from _render_regions(
+                    page, base, tiles, json_data, prompt, cfg, api_key
+                )
+                render_cache.put_bytes(cache_key, img_bytes, ".png")
+            else:
+                mode = "full"
+                img_bytes = yield dict(
+                    image_path=page.original_path,
+                    prompt=prompt,
+                    json_payload=json_data,
+                    cfg=cfg,
+                    api_key=api_key,
+                )
+                render_cache.put_bytes(cache_key, img_bytes, ".png")
         out_path = page_output_path(job.id, page.page_index, "png")
         Path(out_path).write_bytes(img_bytes)
+        write_json_files([(page_rendered_json_path(job.id, page.page_index), json_data)])
         page.output_path = out_path
-        page.status = "done"
-
-        # update job progress
-        job.done_pages = db.query(Page).filter(Page.job_id == job.id, Page.status == "done").count()
-        if job.done_pages == job.total_pages:
-            job.status = "done"
+        page_writer.finalize(page, "done")
+        page.meta = {
+            **(page.meta or {}),
+            "stage_b_cache": "hit" if cache_hit else "miss",
+            "stage_b_mode": mode,
+            "stage_b_regions": len(boxes) if boxes is not None else None,
+            "stage_b_key": cache_key,
+            "stage_b_render_sig": render_sig,
+            "stage_b_image_sha": image_sha,
+            "stage_b_json_sha": json_sha,
+        }
+        # done_pages and the job's done status follow in the same transaction (app.progress)
         db.commit()
 
     except Exception as e:
+        db.rollback()
         page = db.query(Page).filter(Page.id == page_id).first()
         if page:
-            page.status = "failed"
+            page_writer.finalize(page, "failed")
             page.error = str(e)
             db.commit()
     finally:
         db.close()
+
+
+def run_stage_b(page_id: str) -> None:
+    drive(_stage_b_steps(page_id), call_stage_b)
+
+
+async def run_stage_b_async(page_id: str) -> None:
+    await drive_async(_stage_b_steps(page_id), call_stage_b_async)
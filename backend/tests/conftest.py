@@ -0,0 +1,54 @@
+import os
+import tempfile
+from pathlib import Path
+
+from cryptography.fernet import Fernet
+
+# Settings are read at import time, so point the app at a scratch database first
+_data_dir = Path(tempfile.mkdtemp(prefix="mangat-tests-"))
+os.environ["DATA_DIR"] = str(_data_dir)
+os.environ["DATABASE_URL"] = f"sqlite:///{_data_dir / 'mangat.db'}"
+os.environ.setdefault("MASTER_KEY", Fernet.generate_key().decode())
+os.environ["WORKER_MODE"] = "external"
+
+import pytest  # noqa: E402
+
+from app.db import SessionLocal, init_db  # noqa: E402
+from app.models import Job, Page  # noqa: E402
+
+init_db()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_job(db):
+    """Create a job with one page per status in ``statuses``."""
+
+    def make(statuses=(), **fields):
+        job = Job(title="test", total_pages=len(statuses), **fields)
+        db.add(job)
+        db.flush()
+        for index, status in enumerate(statuses, start=1):
+            db.add(Page(job_id=job.id, page_index=index, status=status))
+        db.commit()
+        return job
+
+    return make
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    # Not used as a context manager: startup would start the queue workers
+    return TestClient(app)
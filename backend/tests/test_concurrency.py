@@ -0,0 +1,36 @@
+from app.config import settings
+from app.queue import FairQueue
+
+
+def _create(client, **config):
+    resp = client.post("/api/jobs", json={"title": "c", "config": config})
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def test_job_created_with_global_value_keeps_no_override(client):
+    job = _create(client, stage_b_concurrency=settings.stage_b_concurrency)
+
+    assert "stage_b_concurrency" not in job["config"]
+    assert "stage_a_concurrency" not in job["config"]
+
+
+def test_job_created_with_other_value_keeps_override(client):
+    job = _create(client, stage_b_concurrency=settings.stage_b_concurrency + 5)
+
+    assert job["config"]["stage_b_concurrency"] == settings.stage_b_concurrency + 5
+
+
+def test_limit_follows_global_resize_unless_overridden(db, make_job):
+    follower = make_job(["queued"])
+    pinned = make_job(["queued"], config={"stage_b_concurrency": 10})
+    q = FairQueue("test-b", "stage_b_concurrency")
+    q.resize(4)
+    q.set_job_limit(follower.id)
+    q.set_job_limit(pinned.id)
+
+    q.resize(8)
+
+    assert q._limit(follower.id) == 8
+    assert q._limit(pinned.id) == 10
+    assert q._load_job_limit(db, follower.id) == 8
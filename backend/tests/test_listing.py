@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import listing
+from app.models import Job
+
+
+def _collect(client, url, limit, **query):
+    items, cursor, calls = [], None, 0
+    while True:
+        # httpx drops the query string of ``url`` when ``params`` is given
+        params = {**query, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        resp = client.get(url, params=params)
+        assert resp.status_code == 200
+        body = resp.json()
+        items += body["items"]
+        calls += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items, calls
+
+
+def test_cursor_round_trip():
+    values = ["2026-01-02T03:04:05.000006", "a/b+c=="]
+    cursor = listing.encode_cursor(values)
+
+    assert "=" not in cursor
+    assert "/" not in cursor and "+" not in cursor
+    assert listing.decode_cursor(cursor, 2) == values
+
+
+def test_empty_cursor_means_first_page():
+    assert listing.decode_cursor(None, 2) is None
+    assert listing.decode_cursor("", 2) is None
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", listing.encode_cursor([1]), "e30"])
+def test_bad_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        listing.decode_cursor(cursor, 2)
+    assert exc.value.status_code == 400
+
+
+def test_jobs_with_equal_created_at_break_ties_on_id(client, db):
+    tag = f"cursor-{uuid.uuid4().hex}"
+    stamp = datetime(2026, 1, 1, 12, 0, 0)
+    jobs = [Job(title=f"same-{i}", tags=[tag], created_at=stamp) for i in range(5)]
+    jobs += [
+        Job(title="newer", tags=[tag], created_at=stamp + timedelta(seconds=1)),
+        Job(title="older", tags=[tag], created_at=stamp - timedelta(seconds=1)),
+    ]
+    db.add_all(jobs)
+    db.commit()
+    expected = [j.id for j in sorted(jobs, key=lambda j: (j.created_at, j.id), reverse=True)]
+
+    items, calls = _collect(client, "/api/jobs", limit=2, tag=tag, fields="id")
+
+    assert [item["id"] for item in items] == expected
+    assert calls == 4
+
+
+def test_last_page_has_no_cursor_when_it_is_exactly_full(client, make_job):
+    job = make_job(["queued"] * 4)
+
+    first = client.get(f"/api/jobs/{job.id}/pages", params={"limit": 2}).json()
+    second = client.get(
+        f"/api/jobs/{job.id}/pages", params={"limit": 2, "cursor": first["next_cursor"]}
+    ).json()
+
+    assert [p["page_index"] for p in first["items"]] == [1, 2]
+    assert [p["page_index"] for p in second["items"]] == [3, 4]
+    assert second["next_cursor"] is None
+
+
+def test_pages_list_keeps_reading_order_across_pages(client, make_job):
+    job = make_job(["queued", "failed", "done", "blocked", "queued"])
+
+    items, calls = _collect(client, f"/api/jobs/{job.id}/pages", limit=2)
+
+    assert [p["page_index"] for p in items] == [1, 2, 3, 4, 5]
+    assert calls == 3
+
+
+def test_invalid_cursor_returns_400(client, make_job):
+    job = make_job(["queued"])
+
+    resp = client.get(f"/api/jobs/{job.id}/pages", params={"cursor": "garbage"})
+
+    assert resp.status_code == 400
@@ -0,0 +1,31 @@
+from app.llm_gateway import AdaptiveLimiter
+
+
+def test_burst_of_throttles_halves_the_limit_once():
+    limiter = AdaptiveLimiter(1, 16)
+    epochs = [limiter.acquire() for _ in range(8)]
+
+    for epoch in epochs:
+        limiter.release(epoch, ok=False, throttled=True)
+
+    assert limiter.limit == 8
+    assert limiter.in_flight == 0
+
+
+def test_throttle_after_a_decrease_halves_again():
+    limiter = AdaptiveLimiter(1, 16)
+    limiter.release(limiter.acquire(), ok=False, throttled=True)
+
+    limiter.release(limiter.acquire(), ok=False, throttled=True)
+
+    assert limiter.limit == 4
+
+
+def test_success_grows_the_limit_back():
+    limiter = AdaptiveLimiter(1, 16)
+    limiter.release(limiter.acquire(), ok=False, throttled=True)
+
+    for _ in range(8):
+        limiter.release(limiter.acquire(), ok=True)
+
+    assert 8 < limiter.limit <= 9
@@ -0,0 +1,37 @@
+import json
+
+from app.page_json import iter_job_json
+
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_items_view_skips_a_corrupt_page(tmp_path):
+    good = {"items": [{"id": "a", "type": "dialogue"}, {"id": "b", "type": "sfx"}]}
+    pages = [
+        ("p1", 1, "done", _write(tmp_path, "1.json", json.dumps(good))),
+        ("p2", 2, "done", _write(tmp_path, "2.json", '{"items": [')),
+        ("p3", 3, "done", _write(tmp_path, "3.json", json.dumps(good))),
+    ]
+
+    body = json.loads(b"".join(iter_job_json("job", pages, "items", {"types": ["sfx"]})))
+
+    assert body["job_id"] == "job"
+    assert [(e["page_index"], e["item"]["id"]) for e in body["items"]] == [(1, "b"), (3, "b")]
+
+
+def test_pages_view_copies_files_and_leaves_out_missing_ones(tmp_path):
+    pages = [
+        ("p1", 1, "done", _write(tmp_path, "1.json", '{"items": []}')),
+        ("p2", 2, "queued", str(tmp_path / "missing.json")),
+        ("p3", 3, "queued", ""),
+    ]
+
+    body = json.loads(b"".join(iter_job_json("job", pages, "pages", {})))
+
+    assert body["pages"] == [
+        {"id": "p1", "page_index": 1, "status": "done", "content": {"items": []}}
+    ]
@@ -0,0 +1,39 @@
+from app import progress
+from app.models import Job, Page
+from app.page_writer import page_writer
+
+
+def _status(db, page_id):
+    db.expire_all()
+    return db.query(Page).filter(Page.id == page_id).one().status
+
+
+def test_final_status_replaces_a_marker_that_already_landed(db, make_job):
+    job = make_job(["done"], status="done")
+    page = db.query(Page).filter(Page.job_id == job.id).one()
+
+    # A cache-hit rerun: the marker is in the row before the worker finishes
+    page_writer.set_status(page.id, "B_running", page.status)
+    assert page_writer.flush()
+
+    page_writer.finalize(page, "done")
+    db.commit()
+
+    assert _status(db, page.id) == "done"
+    assert progress.counts(db, job.id) == {"done": 1}
+    job = db.query(Job).filter(Job.id == job.id).one()
+    assert job.done_pages == 1
+    assert job.status == "done"
+
+
+def test_pending_marker_is_dropped_by_final_status(db, make_job):
+    job = make_job(["A_done"])
+    page = db.query(Page).filter(Page.job_id == job.id).one()
+
+    page_writer.set_status(page.id, "A_running", page.status)
+    page_writer.finalize(page, "A_done")
+    db.commit()
+    assert page_writer.flush()
+
+    assert _status(db, page.id) == "A_done"
+    assert progress.counts(db, job.id) == {"A_done": 1}
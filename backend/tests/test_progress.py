@@ -0,0 +1,119 @@
+from app import progress
+from app.db import SessionLocal
+from app.models import Job, Page
+
+
+def _pages(db, job):
+    return db.query(Page).filter(Page.job_id == job.id).order_by(Page.page_index).all()
+
+
+def _job(db, job):
+    db.expire_all()
+    return db.query(Job).filter(Job.id == job.id).one()
+
+
+def test_insert_counts_each_new_page(db, make_job):
+    job = make_job(["queued", "queued", "failed"])
+
+    assert progress.counts(db, job.id) == {"queued": 2, "failed": 1}
+
+
+def test_update_moves_one_page_between_statuses(db, make_job):
+    job = make_job(["queued", "queued"])
+    page = _pages(db, job)[0]
+
+    page.status = "A_done"
+    db.commit()
+    assert progress.counts(db, job.id) == {"queued": 1, "A_done": 1}
+
+    page.status = "done"
+    db.commit()
+    assert progress.counts(db, job.id) == {"queued": 1, "done": 1}
+    assert _job(db, job).done_pages == 1
+
+
+def test_update_without_status_change_leaves_counts(db, make_job):
+    job = make_job(["A_done"])
+    page = _pages(db, job)[0]
+
+    page.status = "A_done"
+    page.error = "retry"
+    db.commit()
+
+    assert progress.counts(db, job.id) == {"A_done": 1}
+
+
+def test_update_starts_from_stored_status_not_stale_copy(db, make_job):
+    job = make_job(["queued"])
+    stale = _pages(db, job)[0]
+
+    other = SessionLocal()
+    try:
+        other.query(Page).filter(Page.id == stale.id).one().status = "A_done"
+        other.commit()
+    finally:
+        other.close()
+
+    # This session still holds "queued" for the page
+    stale.status = "done"
+    db.commit()
+
+    assert progress.counts(db, job.id) == {"done": 1}
+
+
+def test_delete_removes_page_from_its_current_status(db, make_job):
+    job = make_job(["queued", "done"])
+    first, second = _pages(db, job)
+
+    db.delete(first)
+    db.delete(second)
+    db.commit()
+
+    assert progress.counts(db, job.id) == {}
+    assert _job(db, job).done_pages == 0
+
+
+def test_job_is_done_when_last_page_finishes(db, make_job):
+    job = make_job(["done", "A_done"])
+    page = _pages(db, job)[1]
+
+    page.status = "done"
+    db.commit()
+
+    job = _job(db, job)
+    assert job.status == "done"
+    assert job.done_pages == 2
+
+
+def test_job_reopens_when_a_done_page_is_requeued(db, make_job):
+    job = make_job(["A_done", "A_done"], status="running")
+    for page in _pages(db, job):
+        page.status = "done"
+    db.commit()
+    assert _job(db, job).status == "done"
+
+    _pages(db, job)[0].status = "queued"
+    db.commit()
+
+    job = _job(db, job)
+    assert job.status == "running"
+    assert job.done_pages == 1
+    assert progress.counts(db, job.id) == {"queued": 1, "done": 1}
+
+
+def test_requeue_endpoint_reopens_done_job(client, db, make_job):
+    job = make_job(["A_done"], status="running")
+    page = _pages(db, job)[0]
+    page.status = "done"
+    db.commit()
+    assert _job(db, job).status == "done"
+
+    resp = client.post(
+        f"/api/jobs/{job.id}/requeue", json={"stage": "B", "statuses": ["done"]}
+    )
+
+    assert resp.status_code == 200
+    assert resp.json()["stage_b"] == [1]
+    job = _job(db, job)
+    assert job.status == "running"
+    assert progress.counts(db, job.id) == {"A_done": 1}
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from app.models import Page, Task
+from app.queue import reclaim_expired_tasks
+
+
+def test_abandoned_batch_task_fails_every_page(db, make_job):
+    job = make_job(["A_running", "A_running", "A_running", "queued"])
+    pages = db.query(Page).filter(Page.job_id == job.id).order_by(Page.page_index).all()
+    head, *members, other = pages
+    db.add(
+        Task(
+            queue="stage_a",
+            fn="app.workers.stage_a.run_stage_a",
+            page_id=head.id,
+            job_id=job.id,
+            kwargs={"batch": [p.id for p in (head, *members)]},
+            status="running",
+            attempts=3,
+            max_attempts=3,
+            lease_expires_at=datetime.utcnow() - timedelta(seconds=1),
+        )
+    )
+    db.commit()
+
+    assert reclaim_expired_tasks() >= 1
+
+    db.expire_all()
+    assert [p.status for p in pages] == ["failed", "failed", "failed", "queued"]
+    assert all(p.error for p in (head, *members))
+    assert not other.error
+
+
+def test_rerun_of_a_page_with_a_pending_task_is_refused(client, db, make_job):
+    job = make_job(["A_done"])
+    page = db.query(Page).filter(Page.job_id == job.id).one()
+
+    first = client.post(f"/api/pages/{page.id}/rerun", params={"stage": "B"})
+    second = client.post(f"/api/pages/{page.id}/rerun", params={"stage": "B"})
+
+    assert first.status_code == 200
+    assert second.status_code == 409
+    assert db.query(Task).filter(Task.page_id == page.id).count() == 1
@@ -0,0 +1,102 @@
+from PIL import Image
+
+from app import regions
+
+
+def _item(box, **fields):
+    return {"bbox_norm": list(box), **fields}
+
+
+def _contains(outer, inner):
+    return regions.union(outer, inner) == tuple(outer)
+
+
+def _grid(step, size):
+    return [
+        (x * step, y * step, x * step + size, y * step + size)
+        for x in range(round(1 / step))
+        for y in range(round(1 / step))
+    ]
+
+
+def test_plan_regions_grows_to_whole_items():
+    items = [
+        _item((0.1, 0.1, 0.3, 0.2)),
+        # Overlaps the first item but not the seed, so it joins on the second pass
+        _item((0.25, 0.15, 0.5, 0.4)),
+        _item((0.8, 0.8, 0.9, 0.9)),
+    ]
+
+    planned = regions.plan_regions([(0.12, 0.12, 0.14, 0.14)], items, 0.01, 0.01)
+
+    assert len(planned) == 1
+    for item in items[:2]:
+        assert _contains(planned[0], regions.item_box(item))
+    assert not regions.overlaps(planned[0], regions.item_box(items[2]))
+
+
+def test_plan_regions_never_cuts_an_item():
+    items = [_item(box) for box in _grid(0.1, 0.13)]
+    seeds = [(0.33, 0.33, 0.36, 0.36), (0.71, 0.12, 0.73, 0.14)]
+
+    for region in regions.plan_regions(seeds, items, 0.005, 0.005):
+        for item in items:
+            box = regions.item_box(item)
+            assert not regions.overlaps(region, box) or _contains(region, box)
+
+
+def test_group_tiles_respects_the_size_limit():
+    # The oversized cluster replaces the first row of the grid
+    clusters = [c for c in _grid(0.1, 0.05) if c[1] > 0] + [(0.0, 0.0, 0.6, 0.05)]
+
+    tiles = regions.group_tiles(clusters, 0.35, 0.35)
+
+    assert (0.0, 0.0, 0.6, 0.05) in tiles
+    for tile in tiles:
+        if tile != (0.0, 0.0, 0.6, 0.05):
+            assert tile[2] - tile[0] <= 0.35 + 1e-9
+            assert tile[3] - tile[1] <= 0.35 + 1e-9
+    for cluster in clusters:
+        assert sum(_contains(tile, cluster) for tile in tiles) == 1
+    assert len(tiles) < len(clusters) / 2
+
+
+def test_items_within_renormalizes_to_the_box():
+    inside = _item((0.6, 0.7, 0.8, 0.9), id="a")
+    clipped = _item((0.4, 0.6, 0.7, 0.8), id="b")
+    outside = _item((0.0, 0.0, 0.2, 0.2), id="c")
+
+    local = regions.items_within((0.5, 0.5, 1.0, 1.0), [inside, clipped, outside])
+
+    assert [(i["id"], i["bbox_norm"]) for i in local] == [
+        ("a", [0.2, 0.4, 0.6, 0.8]),
+        ("b", [0.0, 0.2, 0.4, 0.6]),
+    ]
+    assert inside["bbox_norm"] == [0.6, 0.7, 0.8, 0.9]
+
+
+def test_composite_scales_a_downscaled_patch_to_the_original_box():
+    base = Image.new("RGB", (200, 100), (255, 0, 0))
+    # The model answered the 100x50 crop at half resolution
+    patch = Image.new("RGBA", (50, 25), (0, 0, 255, 255))
+
+    regions.composite(base, patch, (0.5, 0.5, 1.0, 1.0), feather=0)
+
+    assert base.getpixel((100, 50)) == (0, 0, 255)
+    assert base.getpixel((199, 99)) == (0, 0, 255)
+    assert base.getpixel((99, 50)) == (255, 0, 0)
+    assert base.getpixel((100, 49)) == (255, 0, 0)
+
+
+def test_composite_feathers_only_interior_edges():
+    base = Image.new("RGB", (200, 100), (255, 0, 0))
+    patch = Image.new("RGB", (100, 50), (0, 0, 255))
+
+    regions.composite(base, patch, (0.5, 0.5, 1.0, 1.0), feather=8)
+
+    blended = base.getpixel((100, 75))
+    assert 0 < blended[0] < 255 and 0 < blended[2] < 255
+    assert base.getpixel((150, 75)) == (0, 0, 255)
+    # The right and bottom edges sit on the page border and are not faded
+    assert base.getpixel((199, 75)) == (0, 0, 255)
+    assert base.getpixel((150, 99)) == (0, 0, 255)
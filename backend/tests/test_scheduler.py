@@ -0,0 +1,83 @@
+from app.queue import FairScheduler
+
+
+def _push(scheduler, job_id, indexes, priority=0, **kwargs):
+    for index in indexes:
+        scheduler.push(
+            scheduler.make_task(
+                f"{job_id}-t{index}", None, f"{job_id}-p{index}", job_id, priority, index, kwargs
+            )
+        )
+
+
+def _drain(scheduler, eligible=None):
+    order = []
+    while (task := scheduler.pop(eligible)) is not None:
+        order.append((task.job_id, task.page_index))
+    return order
+
+
+def test_jobs_take_turns_in_page_order():
+    scheduler = FairScheduler(0)
+    _push(scheduler, "a", [1, 2, 3])
+    _push(scheduler, "b", [1, 2])
+
+    assert _drain(scheduler) == [("a", 1), ("b", 1), ("a", 2), ("b", 2), ("a", 3)]
+
+
+def test_preview_pages_come_before_older_jobs_but_after_priority():
+    scheduler = FairScheduler(2)
+    _push(scheduler, "old", [3, 4])
+    _push(scheduler, "new", [1, 2, 3])
+    _push(scheduler, "urgent", [5], priority=1)
+
+    assert _drain(scheduler)[:3] == [("urgent", 5), ("new", 1), ("new", 2)]
+
+
+def test_pop_skips_jobs_that_are_not_eligible():
+    scheduler = FairScheduler(0)
+    _push(scheduler, "a", [1, 2])
+    _push(scheduler, "b", [1])
+
+    assert scheduler.pop(lambda job_id: job_id != "a").job_id == "b"
+    assert scheduler.pop(lambda job_id: job_id != "a") is None
+    assert len(scheduler) == 2
+
+
+def test_waves_run_one_page_per_segment():
+    scheduler = FairScheduler(0)
+    scheduler.spans["j"] = 3
+    _push(scheduler, "j", range(1, 10))
+
+    wave = [scheduler.pop() for _ in range(3)]
+
+    assert [task.page_index for task in wave] == [1, 4, 7]
+    # Every segment's next page waits for the page before it
+    assert scheduler.pop() is None
+
+
+def test_release_unblocks_the_next_page_of_its_segment():
+    scheduler = FairScheduler(0)
+    scheduler.spans["j"] = 3
+    _push(scheduler, "j", range(1, 10))
+    first, second, _ = (scheduler.pop() for _ in range(3))
+
+    scheduler.release(second)
+
+    assert scheduler.pop().page_index == 5
+    assert scheduler.pop() is None
+    scheduler.release(first)
+    assert scheduler.pop().page_index == 2
+
+
+def test_batched_task_blocks_the_page_after_its_last_member():
+    scheduler = FairScheduler(0)
+    scheduler.spans["j"] = 4
+    batch = scheduler.make_task("t1", None, "p1", "j", 0, 1, {"batch": ["p1", "p2"]})
+    scheduler.push(batch)
+    _push(scheduler, "j", [3])
+
+    assert scheduler.pop() is batch
+    assert scheduler.pop() is None
+    scheduler.release(batch)
+    assert scheduler.pop().page_index == 3
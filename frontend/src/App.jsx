@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react'
-import { api } from './apiClient.js'
+import { api, fetchAll } from './apiClient.js'
 import { defaultConfig } from './configSchema.js'
 import Sidebar from './components/Sidebar.jsx'
 import GlobalSettingsPanel from './components/GlobalSettingsPanel.jsx'
@@ -55,9 +55,7 @@ export default function App() {
 
   const loadJobs = async () => {
     try {
-      const res = await api('/api/jobs')
-      const data = await res.json()
-      setJobs(data)
+      setJobs(await fetchAll('/api/jobs?fields=id,title,status,done_pages,total_pages,locked'))
     } catch (e) {
       setLog(String(e))
     }
@@ -114,10 +112,16 @@ export default function App() {
   }
 
   const selectJob = async (job) => {
-    setSelectedJob({ ...job, api_key: '' })
     setSelectedPage(null)
     setPageJson(null)
     setJsonText('')
+    try {
+      const res = await api(`/api/jobs/${job.id}`)
+      setSelectedJob({ ...(await res.json()), api_key: '' })
+    } catch (e) {
+      setLog(String(e))
+      return
+    }
     await refreshPages(job.id)
   }
 
@@ -125,9 +129,7 @@ export default function App() {
     const id = jobId || selectedJob?.id
     if (!id) return
     try {
-      const res = await api(`/api/jobs/${id}/pages`)
-      const data = await res.json()
-      setPages(data)
+      setPages(await fetchAll(`/api/jobs/${id}/pages?fields=id,page_index,status,error`))
     } catch (e) {
       setLog(String(e))
     }
@@ -138,8 +140,15 @@ export default function App() {
     const form = new FormData()
     form.append('file', file)
     try {
-      await api(`/api/jobs/${selectedJob.id}/import`, { method: 'POST', body: form })
-      setLog('Archive imported')
+      const res = await api(`/api/jobs/${selectedJob.id}/import`, { method: 'POST', body: form })
+      let task = await res.json()
+      while (task.status === 'queued' || task.status === 'running') {
+        setLog(`Importing ${task.done}/${task.total || '?'}`)
+        await new Promise((r) => setTimeout(r, 1000))
+        const poll = await api(`/api/jobs/${selectedJob.id}/imports/${task.id}`)
+        task = await poll.json()
+      }
+      setLog(task.status === 'done' ? 'Archive imported' : `Import failed: ${task.error}`)
       await refreshPages()
     } catch (e) {
       setLog(String(e))
@@ -235,20 +244,32 @@ export default function App() {
     }
   }
 
+  const requeue = async (body) => {
+    if (!selectedJob) return null
+    const res = await api(`/api/jobs/${selectedJob.id}/requeue`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body)
+    })
+    return res.json()
+  }
+
   const retryFailedA = async () => {
-    const failed = pages.filter((p) => p.status === 'failed')
-    await Promise.all(
-      failed.map((p) => api(`/api/pages/${p.id}/rerun?stage=A`, { method: 'POST' }))
-    )
-    setLog('Retry Stage A for failed pages')
+    try {
+      const data = await requeue({ stage: 'A', statuses: ['failed'] })
+      setLog(`Retry Stage A: ${data.stage_a.length} pages (${data.in_flight} already in flight)`)
+    } catch (e) {
+      setLog(String(e))
+    }
   }
 
   const retryFailedB = async () => {
-    const targets = pages.filter((p) => p.status === 'failed' || p.status === 'blocked')
-    await Promise.all(
-      targets.map((p) => api(`/api/pages/${p.id}/rerun?stage=B`, { method: 'POST' }))
-    )
-    setLog('Retry Stage B for failed/blocked pages')
+    try {
+      const data = await requeue({ stage: 'B', statuses: ['failed', 'blocked'] })
+      setLog(`Retry Stage B: ${data.stage_b.length} pages (${data.in_flight} already in flight)`)
+    } catch (e) {
+      setLog(String(e))
+    }
   }
 
   useEffect(() => {
@@ -256,6 +277,40 @@ export default function App() {
     loadJobs()
   }, [])
 
+  // Live progress: EventSource resumes from Last-Event-ID on reconnect
+  const selectedJobId = selectedJob?.id
+  useEffect(() => {
+    if (!selectedJobId) return
+    const source = new EventSource(`/api/jobs/${selectedJobId}/events`)
+    const applyJob = (data) => {
+      const patch = { status: data.status, done_pages: data.done_pages, total_pages: data.total_pages }
+      setSelectedJob((job) => (job && job.id === data.id ? { ...job, ...patch } : job))
+      setJobs((list) => list.map((job) => (job.id === data.id ? { ...job, ...patch } : job)))
+    }
+    source.addEventListener('snapshot', (e) => {
+      const data = JSON.parse(e.data)
+      if (data.job) applyJob(data.job)
+      const byId = new Map((data.pages || []).map(([id, , status, error]) => [id, { status, error }]))
+      setPages((list) => {
+        const known = new Set(list.map((p) => p.id))
+        if ([...byId.keys()].some((id) => !known.has(id))) refreshPages(selectedJobId)
+        return list.map((p) => (byId.has(p.id) ? { ...p, ...byId.get(p.id) } : p))
+      })
+    })
+    source.addEventListener('page', (e) => {
+      const data = JSON.parse(e.data)
+      setPages((list) => {
+        if (!list.some((p) => p.id === data.id)) {
+          refreshPages(selectedJobId)
+          return list
+        }
+        return list.map((p) => (p.id === data.id ? { ...p, status: data.status, error: data.error } : p))
+      })
+    })
+    source.addEventListener('job', (e) => applyJob(JSON.parse(e.data)))
+    return () => source.close()
+  }, [selectedJobId])
+
   const jobLocked =
     selectedJob?.locked || selectedJob?.status === 'running' || selectedJob?.status === 'done'
   const needsSetup =
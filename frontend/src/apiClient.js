@@ -8,3 +8,17 @@ export async function api(path, options = {}) {
   }
   return res
 }
+
+// Follows next_cursor through a paginated list endpoint and returns every item
+export async function fetchAll(path) {
+  const items = []
+  let cursor = null
+  do {
+    const sep = path.includes('?') ? '&' : '?'
+    const res = await api(cursor ? `${path}${sep}cursor=${encodeURIComponent(cursor)}` : path)
+    const data = await res.json()
+    items.push(...data.items)
+    cursor = data.next_cursor
+  } while (cursor)
+  return items
+}
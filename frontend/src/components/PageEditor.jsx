@@ -236,7 +236,7 @@ export default function PageEditor({
           <div>
             <h3>Original (Edit BBox)</h3>
             <BBoxCanvas
-              imageUrl={`/api/pages/${page.id}/image?variant=original`}
+              imageUrl={`/api/pages/${page.id}/image?variant=original&size=preview`}
               items={pageJson.items}
               selectedId={selectedId}
               onSelect={setSelectedId}
@@ -245,7 +245,7 @@ export default function PageEditor({
           </div>
           <div>
             <h3>Output</h3>
-            <img src={`/api/pages/${page.id}/image?variant=output`} />
+            <img src={`/api/pages/${page.id}/image?variant=output&size=preview`} />
           </div>
         </div>
       </section>
@@ -5,6 +5,7 @@ export default function PagesPanel({ pages, onSelectPage }) {
       <div className="pages">
         {pages.map((p) => (
           <div key={p.id} className="page" onClick={() => onSelectPage(p)}>
+            <img className="page-thumb" loading="lazy" src={`/api/pages/${p.id}/image?size=thumb`} />
             <div>#{p.page_index}</div>
             <div>{p.status}</div>
           </div>
@@ -12,9 +12,21 @@ export const defaultConfig = {
   stage_a_timeout: 120,
   stage_b_timeout: 300,
   retries: 1,
+  stage_a_max_edge: 2048,
+  stage_a_image_format: 'jpeg',
+  stage_a_image_quality: 90,
   stage_a_concurrency: 6,
+  stage_a_context_mode: 'waves',
+  stage_a_batch_size: 1,
   stage_b_concurrency: 4,
-  keep_all_artifacts: true
+  stage_b_incremental: false,
+  stage_b_region_padding: 32,
+  stage_b_incremental_max_area: 0.5,
+  stage_b_tiling: 'off',
+  stage_b_tile_max_edge: 2048,
+  keep_all_artifacts: true,
+  pdf_dpi: 200,
+  pdf_format: 'png'
 }
 
 export const configFields = [
@@ -31,7 +43,19 @@ export const configFields = [
   { key: 'stage_a_timeout', label: 'Stage A Timeout (s)', type: 'number' },
   { key: 'stage_b_timeout', label: 'Stage B Timeout (s)', type: 'number' },
   { key: 'retries', label: 'Retries', type: 'number' },
-  { key: 'stage_a_concurrency', label: 'Stage A Concurrency', type: 'number', hint: '需重启服务生效' },
-  { key: 'stage_b_concurrency', label: 'Stage B Concurrency', type: 'number', hint: '需重启服务生效' },
-  { key: 'keep_all_artifacts', label: 'Keep All Artifacts', type: 'checkbox' }
+  { key: 'stage_a_max_edge', label: 'Stage A Max Edge (px)', type: 'number', hint: '0 = 不缩放' },
+  { key: 'stage_a_image_format', label: 'Stage A Image Format', type: 'select', options: ['jpeg', 'webp', 'png', 'original'] },
+  { key: 'stage_a_image_quality', label: 'Stage A Image Quality', type: 'number' },
+  { key: 'stage_a_concurrency', label: 'Stage A Concurrency', type: 'number', hint: '项目中留空或与全局相同 = 跟随全局设置' },
+  { key: 'stage_a_context_mode', label: 'Stage A Context Mode', type: 'select', options: ['waves', 'opportunistic'], hint: 'waves = 分段推进，保证上一页摘要可用' },
+  { key: 'stage_a_batch_size', label: 'Stage A Batch Size', type: 'number', hint: '单次请求包含的连续页数，1 = 不合并' },
+  { key: 'stage_b_concurrency', label: 'Stage B Concurrency', type: 'number', hint: '项目中留空或与全局相同 = 跟随全局设置' },
+  { key: 'stage_b_incremental', label: 'Stage B Incremental', type: 'checkbox', hint: '修改 JSON 后只重绘改动的气泡区域' },
+  { key: 'stage_b_region_padding', label: 'Stage B Region Padding (px)', type: 'number' },
+  { key: 'stage_b_incremental_max_area', label: 'Stage B Incremental Max Area', type: 'number', hint: '改动区域超过页面该比例时整页重绘' },
+  { key: 'stage_b_tiling', label: 'Stage B Tiling', type: 'select', options: ['off', 'auto', 'always'], hint: 'auto = 长边超过分块尺寸时按气泡分块并行渲染' },
+  { key: 'stage_b_tile_max_edge', label: 'Stage B Tile Max Edge (px)', type: 'number' },
+  { key: 'keep_all_artifacts', label: 'Keep All Artifacts', type: 'checkbox' },
+  { key: 'pdf_dpi', label: 'PDF DPI', type: 'number' },
+  { key: 'pdf_format', label: 'PDF Page Format', type: 'select', options: ['png', 'jpeg'] }
 ]